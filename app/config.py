@@ -5,19 +5,111 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     
+    # Database connection pool (per engine, per worker process)
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_POOL_RECYCLE: int = 1800  # seconds; keep below server/proxy idle timeouts
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_ECHO: bool = False
+    # Behind PgBouncer in transaction mode: no app-side pool, no prepared statements
+    DATABASE_PGBOUNCER: bool = False
+    
     # JWT
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Authenticated users cached per worker (skips the users lookup); 0 disables
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Password hashing: bcrypt cost (older hashes are upgraded on login) and the
+    # dedicated threads it runs on, so logins never block the event loop
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_WORKERS: int = 2
+    BCRYPT_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    
     # RAG API
     RAG_API_URL: str
     RAG_API_KEY: str
+    RAG_STREAM_URL: str = ""  # defaults to RAG_API_URL + "/stream"
+    
+    # Several RAG router replicas (comma separated ask URLs); defaults to RAG_API_URL.
+    # Streaming uses <url>/stream and health checks GET <origin><RAG_HEALTH_PATH>.
+    RAG_API_URLS: str = ""
+    RAG_HEALTH_PATH: str = "/health"
+    RAG_HEALTH_INTERVAL_SECONDS: float = 0.0  # active checks are opt-in (e.g. 10)
+    RAG_HEALTH_TIMEOUT_SECONDS: float = 2.0
+    RAG_EJECT_CONSECUTIVE_FAILURES: int = 3
+    RAG_EJECT_SECONDS: float = 30.0
+
+    # RAG HTTP client (one shared, pooled client per worker)
+    RAG_HTTP2: bool = False
+    RAG_MAX_CONNECTIONS: int = 100
+    RAG_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    RAG_KEEPALIVE_EXPIRY: float = 30.0
+    RAG_CONNECT_TIMEOUT: float = 5.0
+    RAG_READ_TIMEOUT: float = 180.0
+    RAG_WRITE_TIMEOUT: float = 10.0
+    RAG_POOL_TIMEOUT: float = 10.0
+
+    # RAG resilience: circuit breaker, connect-failure retries, adaptive read timeout
+    RAG_BREAKER_FAILURE_THRESHOLD: int = 5
+    RAG_BREAKER_RESET_SECONDS: float = 30.0
+    RAG_BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    RAG_RETRY_MAX_ATTEMPTS: int = 2
+    RAG_RETRY_BASE_DELAY: float = 0.2
+    RAG_RETRY_MAX_DELAY: float = 2.0
+    RAG_RETRY_BUDGET_RATIO: float = 0.1
+    RAG_RETRY_BUDGET_MAX_TOKENS: float = 10.0
+    RAG_TIMEOUT_PERCENTILE: float = 99.0
+    RAG_TIMEOUT_MULTIPLIER: float = 2.0
+    RAG_TIMEOUT_MIN_SECONDS: float = 20.0
+    RAG_TIMEOUT_MIN_SAMPLES: int = 20
+
+    # RAG admission control (per worker): concurrent calls and max queue wait
+    RAG_MAX_CONCURRENCY: int = 32
+    RAG_QUEUE_TIMEOUT_SECONDS: float = 15.0
+
+    # RAG answer cache (per worker; only for questions with little/no history)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+    ANSWER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ANSWER_CACHE_MAX_HISTORY_TURNS: int = 0
+
+    # Share one upstream call between identical concurrent first-turn questions
+    RAG_COALESCE_ENABLED: bool = True
+
+    # Subjects / grades / plans cached in process; reloaded after the TTL or on a
+    # Postgres NOTIFY from their change triggers (LISTEN is skipped behind PgBouncer)
+    REFERENCE_DATA_TTL_SECONDS: float = 300.0
+    REFERENCE_DATA_LISTEN: bool = True
+    # Cache-Control max-age for GET /subjects and /subjects/grades (browsers / CDN)
+    CATALOG_CACHE_MAX_AGE_SECONDS: int = 300
+
+    # Chat history sent to the RAG router (older turns go into a rolling summary)
+    CHAT_HISTORY_MAX_TURNS: int = 10
+    CHAT_HISTORY_TOKEN_BUDGET: int = 3000
+    CHAT_SUMMARY_TOKEN_BUDGET: int = 600
+
+    # Background chat jobs (POST /api/chat/message?async=true)
+    CHAT_JOB_WORKER_ENABLED: bool = True
+    CHAT_JOB_CONCURRENCY: int = 4
+    CHAT_JOB_POLL_SECONDS: float = 2.0
+    CHAT_JOB_STALE_SECONDS: int = 600
+    CHAT_JOB_MAX_ATTEMPTS: int = 3
+    CHAT_JOB_EVENTS_TIMEOUT_SECONDS: float = 600.0  # longest a /jobs/{id}/events stream waits
 
     # Google OAuth
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    # ID token signing certificates ({kid: PEM}, cached per their Cache-Control) and
+    # accepted issuers; point both at a stand-in issuer to test sign-in locally
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_TOKEN_ISSUERS: str = "accounts.google.com,https://accounts.google.com"
     
     # Environment
     ENVIRONMENT: str = "development"
@@ -1,20 +1,124 @@
-from sqlalchemy import create_engine
+import time
+from uuid import uuid4
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.config import settings
+from app.utils.metrics import LatencyWindow
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long checkouts wait for a connection"""
+
+    checkout_wait: LatencyWindow
+    checkout_timeouts = 0
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            type(self).checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.add(time.monotonic() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    checkout_wait = LatencyWindow()
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    checkout_wait = LatencyWindow()
+
+
+def _pool_options(poolclass) -> dict:
+    if settings.DATABASE_PGBOUNCER:
+        # PgBouncer does the pooling; holding connections here would pin its server slots
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+
 
 # Create engine
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using
-    poolclass=None,
-    echo=True if settings.ENVIRONMENT == "development" else False  # Log SQL queries in dev
+    echo=settings.DATABASE_ECHO,
+    **_pool_options(InstrumentedQueuePool)
 )
 
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(database_url: str) -> URL:
+    """Same database, through asyncpg (which takes ssl= instead of libpq's sslmode=)"""
+    url = make_url(database_url)
+    if url.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode and "ssl" not in query:
+        query["ssl"] = sslmode
+    query.pop("channel_binding", None)  # libpq only
+    return url.set(query=query)
+
+
+def _async_connect_args() -> dict:
+    if not settings.DATABASE_PGBOUNCER:
+        return {}
+    # Transaction pooling can move a session to another server connection
+    # between statements, so asyncpg must not cache or reuse prepared statements
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+# Async engine used by the API (the sync engine above is kept for scripts and alembic)
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    echo=settings.DATABASE_ECHO,
+    connect_args=_async_connect_args(),
+    **_pool_options(InstrumentedAsyncQueuePool)
+)
+
+# expire_on_commit=False: objects stay readable after commit without a lazy reload
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def pool_stats() -> dict:
+    """Connection pool gauges + checkout wait times for both engines"""
+    stats = {}
+    for name, pool in (("async", async_engine.pool), ("sync", engine.pool)):
+        if not isinstance(pool, QueuePool):
+            stats[name] = {"pool": type(pool).__name__}
+            continue
+        stats[name] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+            "checkout_wait": pool.checkout_wait.summary(),
+            "checkout_timeouts": pool.checkout_timeouts,
+        }
+    return stats
+
+
 # Base class for models
 Base = declarative_base()
 
@@ -24,4 +128,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
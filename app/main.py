@@ -1,17 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
-from app.routes import auth, chat, user, feedback, subjects, dashboard, files
+from app.database import engine, async_engine, Base
+from app.routes import auth, chat, user, feedback, subjects, dashboard, files, admin
+from app.services.rag_service import RAGService
+from app.services.reference_data_service import ReferenceDataService
+from app.services.chat_job_service import chat_job_worker
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Startup / shutdown of shared resources
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await RAGService.startup()
+    await ReferenceDataService.startup()
+    await chat_job_worker.start()
+    try:
+        yield
+    finally:
+        await chat_job_worker.stop()
+        await ReferenceDataService.shutdown()
+        await RAGService.shutdown()
+        await async_engine.dispose()
+
 # Create FastAPI app
 app = FastAPI(
     title="STEAMX API",
     description="Backend API for STEAMX - AI-powered learning assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -40,7 +59,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # "*" is not honoured on credentialed requests, so name the headers clients read
+    expose_headers=["*", "X-Session-Version"],
 )
 
 # Include routers
@@ -51,6 +71,7 @@ app.include_router(feedback.router, prefix="/api")
 app.include_router(subjects.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
 app.include_router(files.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 # Root endpoint
 @app.get("/")
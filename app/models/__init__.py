@@ -3,6 +3,7 @@ from app.models.subject import Subject
 from app.models.grade import Grade
 from app.models.chat_sessions import ChatSession, SessionStatus
 from app.models.chat_messages import ChatMessage
+from app.models.chat_job import ChatJob, ChatJobStatus
 from app.models.system_message import SystemMessage
 from app.models.uploaded_file import UploadedFile
 from app.models.message_attachment import MessageAttachment
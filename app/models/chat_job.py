@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Text, Integer, DateTime, ForeignKey, JSON, Index, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+import enum
+from app.database import Base
+
+class ChatJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class ChatJob(Base):
+    __tablename__ = "chat_jobs"
+    __table_args__ = (
+        # Worker claim query: oldest queued/running job first
+        Index("ix_chat_jobs_status_created_at", "status", "created_at"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id"), nullable=False)
+    
+    # The queued request
+    prompt = Column(Text, nullable=False)
+    file_ids = Column(JSON, nullable=True)
+    
+    # Processing state
+    status = Column(SQLAlchemyEnum(ChatJobStatus), default=ChatJobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    error_status = Column(Integer, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="chat_jobs")
+    session = relationship("ChatSession", back_populates="jobs")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, Integer, BigInteger, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Text, Integer, BigInteger, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,6 +7,12 @@ from app.database import Base
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Transcript and history reads: one session's turns in order
+        Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),
+        # Transcript delta sync: a session's turns changed since a point in time
+        Index("ix_chat_messages_session_id_updated_at", "session_id", "updated_at"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id"), nullable=False)
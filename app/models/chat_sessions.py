@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, JSON, Index, desc, Enum as SQLAlchemyEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,6 +13,10 @@ class SessionStatus(str, enum.Enum):
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # Session lists: a user's active sessions, most recently updated first
+        Index("ix_chat_sessions_user_id_status_updated_at", "user_id", "status", desc("updated_at")),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -22,6 +26,7 @@ class ChatSession(Base):
     total_qa_pairs = Column(Integer, default=0)
     total_tokens_used = Column(BigInteger, nullable=True)
     status = Column(SQLAlchemyEnum(SessionStatus), default=SessionStatus.ACTIVE)
+    rag_route = Column(JSON, nullable=True)  # router's pinned route (route, selected_rag_key, book_id, ...)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -30,4 +35,5 @@ class ChatSession(Base):
     subject = relationship("Subject", back_populates="chat_sessions")
     grade = relationship("Grade", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
-    system_messages = relationship("SystemMessage", back_populates="session", cascade="all, delete-orphan")
\ No newline at end of file
+    system_messages = relationship("SystemMessage", back_populates="session", cascade="all, delete-orphan")
+    jobs = relationship("ChatJob", back_populates="session", cascade="all, delete-orphan")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Text, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,11 +7,21 @@ from app.database import Base
 
 class SystemMessage(Base):
     __tablename__ = "system_messages"
+    __table_args__ = (
+        # Latest rolling summary of a session
+        Index("ix_system_messages_session_id_created_at", "session_id", "created_at"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id"), nullable=False)
     content = Column(Text, nullable=False)
+    
+    # Rolling summary of older Q&A turns: covers turns created up to this point
+    summarized_until = Column(DateTime, nullable=True)
+    turns_summarized = Column(Integer, default=0)
+    
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     session = relationship("ChatSession", back_populates="system_messages")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Date, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,6 +7,10 @@ from app.database import Base
 
 class UsageDaily(Base):
     __tablename__ = "usage_daily"
+    __table_args__ = (
+        # One counter row per user per day
+        UniqueConstraint("user_id", "date", name="uq_usage_daily_user_id_date"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -43,6 +43,7 @@ class User(Base):
     
     # Relationships
     chat_sessions = relationship("ChatSession", back_populates="user", cascade="all, delete-orphan")
+    chat_jobs = relationship("ChatJob", back_populates="user", cascade="all, delete-orphan")
     
     # Feedback relationships - explicit foreign_keys to avoid ambiguity
     feedbacks = relationship("Feedback", foreign_keys="[Feedback.user_id]", back_populates="user", cascade="all, delete-orphan")
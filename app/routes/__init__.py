@@ -1,3 +1,3 @@
-from app.routes import auth, chat, user, feedback, subjects, dashboard, files
+from app.routes import auth, chat, user, feedback, subjects, dashboard, files, admin
 
-__all__ = ["auth", "chat", "user", "feedback", "subjects", "dashboard", "files"]
\ No newline at end of file
+__all__ = ["auth", "chat", "user", "feedback", "subjects", "dashboard", "files", "admin"]
\ No newline at end of file
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends
+from typing import Optional
+from uuid import UUID
+from app.database import pool_stats
+from app.utils.security import bcrypt_stats
+from app.middleware.auth import require_admin
+from app.models.user import User
+from app.services.answer_cache import answer_cache
+from app.services.principal_cache import principal_cache
+from app.services.chat_service import ChatService
+from app.services.google_auth_service import GoogleAuthService
+from app.services.rag_service import RAGService
+from app.services.reference_data_service import ReferenceDataService
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/metrics")
+async def get_metrics(current_user: User = Depends(require_admin)):
+    """Runtime counters for this worker"""
+    return {
+        "answer_cache": answer_cache.stats(),
+        "rag": RAGService.stats(),
+        "database": pool_stats(),
+        "reference_data": ReferenceDataService.stats(),
+        "principal_cache": principal_cache.stats(),
+        "bcrypt": bcrypt_stats(),
+        "google_certs": GoogleAuthService.certs.stats(),
+        "chat_latency": {phase: window.summary() for phase, window in ChatService.phase_latency.items()},
+    }
+
+@router.get("/cache/answers")
+async def get_answer_cache_stats(current_user: User = Depends(require_admin)):
+    """Answer cache size and hit/miss counters (this worker only)"""
+    return answer_cache.stats()
+
+@router.delete("/cache/answers")
+async def invalidate_answer_cache(
+    subject_id: Optional[UUID] = None,
+    grade_id: Optional[UUID] = None,
+    current_user: User = Depends(require_admin)
+):
+    """Drop cached answers for a subject and/or grade, or all of them (this worker only)"""
+    invalidated = answer_cache.invalidate(
+        subject_id=str(subject_id) if subject_id else None,
+        grade_id=str(grade_id) if grade_id else None
+    )
+    return {"invalidated": invalidated}
+
+@router.post("/cache/reference-data")
+async def reload_reference_data(current_user: User = Depends(require_admin)):
+    """Reload subjects, grades and plans now (this worker only; others follow via NOTIFY/TTL)"""
+    await ReferenceDataService.load()
+    return ReferenceDataService.stats()
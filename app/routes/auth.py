@@ -1,56 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.auth import LoginRequest, TokenResponse, RefreshTokenRequest
 from app.schemas.user import UserCreate
 from app.schemas.google_auth import GoogleAuthRequest, GoogleAuthResponse
 from app.services.auth_service import AuthService
 from app.services.google_auth_service import GoogleAuthService
+from app.services.principal_cache import principal_cache
 from app.utils.security import decode_token, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    return AuthService.register_user(db, user_data)
+    return await AuthService.register_user(db, user_data)
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
+async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Login and get access tokens"""
     
-    result = AuthService.login(db, credentials)
+    result = await AuthService.login(db, credentials)
     
     # Update login timestamps
     from app.models.user import User
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = await db.scalar(select(User).where(User.email == credentials.email))
     
     if user:
         if user.first_login_at is None:
             user.first_login_at = datetime.utcnow()
         user.last_login_at = datetime.utcnow()
-        db.commit()
+        await db.commit()
+        principal_cache.invalidate(user.id)
     
     return result
 
 @router.post("/google", response_model=GoogleAuthResponse)
 async def google_auth(
     request: GoogleAuthRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Authenticate with Google"""
-    result = GoogleAuthService.authenticate_google_user(db, request.token)
+    result = await GoogleAuthService.authenticate_google_user(db, request.token)
     
     # Update login timestamps
     from app.models.user import User
-    user = db.query(User).filter(User.email == result.user.email).first()
+    user = await db.scalar(select(User).where(User.email == result.user.email))
     
     if user:
         if user.first_login_at is None:
             user.first_login_at = datetime.utcnow()
         user.last_login_at = datetime.utcnow()
-        db.commit()
+        await db.commit()
+        principal_cache.invalidate(user.id)
     
     return result
 
@@ -99,27 +99,36 @@
 # ):
 #     """Delete a chat session"""
 #     return ChatService.delete_session(db, session_id, current_user)
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, AsyncSessionLocal
 from app.middleware.auth import get_current_user
 from app.models.user import User
-from app.models.subject import Subject
-from app.models.grade import Grade
+from app.models.chat_job import ChatJob
+from app.utils.http_cache import etag_matches, make_etag, not_modified
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 from app.schemas.chat import (
     CreateSessionRequest,
     SendMessageRequest,
     RegenerateResponseRequest,
     ChatSessionResponse,
+    ChatSessionList,
     ChatSessionWithMessages,
     SendMessageResponse,
-    RegenerateResponseResponse
+    RegenerateResponseResponse,
+    ChatJobResponse
 )
 
 from app.services.chat_service import ChatService
+from app.services.chat_job_service import ChatJobService, chat_job_worker
 
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
@@ -131,24 +140,11 @@ router = APIRouter(prefix="/chat", tags=["Chat"])
 @router.post("/sessions", response_model=ChatSessionResponse)
 async def create_session(
     request: CreateSessionRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    subject = db.query(Subject).filter(Subject.id == request.subject_id).first()
-    if not subject:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid subject_id"
-        )
-
-    grade = db.query(Grade).filter(Grade.id == request.grade_id).first()
-    if not grade:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid grade_id"
-        )
-
-    return ChatService.create_session(
+    # subject_id / grade_id are validated by the service
+    return await ChatService.create_session(
         db,
         current_user,
         request.subject_id,
@@ -159,12 +155,19 @@ async def create_session(
 # -------------------------
 # Get Sessions
 # -------------------------
-@router.get("/sessions", response_model=list[ChatSessionResponse])
+@router.get("/sessions", response_model=ChatSessionList)
 async def get_sessions(
-    db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return ChatService.get_user_sessions(db, current_user)
+    """
+    Sessions, most recently updated first, one page at a time; pass
+    next_cursor as ?cursor= to load the next page.
+    """
+    sessions, next_cursor = await ChatService.get_user_sessions(db, current_user, limit, cursor)
+    return ChatSessionList(sessions=sessions, next_cursor=next_cursor)
 
 
 # -------------------------
@@ -173,24 +176,76 @@ async def get_sessions(
 @router.get("/sessions/{session_id}", response_model=ChatSessionWithMessages)
 async def get_session(
     session_id: UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    since: str | None = Query(None, description="Version token (or timestamp) the client already has"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return ChatService.get_session_with_messages(db, session_id, current_user)
+    """
+    The session and its latest Q&A pairs; pass next_cursor as ?cursor= to
+    load the earlier ones.
+    
+    Reopening a conversation: send the last version as ?since= to get only
+    new/regenerated Q&A pairs (delta=true, merge by id). The current version
+    is also in the X-Session-Version header.
+    
+    Responses carry an ETag; with a matching If-None-Match the answer is a
+    304 decided from the session row alone (no message rows are read).
+    """
+    session = await ChatService.get_owned_session(db, session_id, current_user)
+    version = ChatService.session_version(session)
+    headers = {
+        "ETag": make_etag(session.id, version, limit, cursor, since),
+        "Cache-Control": "private, no-cache",  # revalidate every time; 304s are cheap
+        "X-Session-Version": version,
+    }
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    
+    result = await ChatService.get_session_with_messages(db, session, limit, cursor, since)
+    response.headers.update(headers)
+    return result
 
 
 # -------------------------
 # Send Message
 # -------------------------
-@router.post("/message", response_model=SendMessageResponse)
+@router.post(
+    "/message",
+    response_model=SendMessageResponse,
+    responses={202: {"model": ChatJobResponse}}
+)
 async def send_message(
     request: SendMessageRequest,
-    db: Session = Depends(get_db),
+    async_mode: bool = Query(False, alias="async"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    With ?async=true the prompt is queued and 202 is returned immediately
+    with a job; poll GET /chat/jobs/{job_id} or listen on
+    GET /chat/jobs/{job_id}/events for the answer.
+    """
     try:
         file_ids = request.file_ids or []
 
+        if async_mode:
+            job = await ChatJobService.enqueue(
+                db,
+                request.session_id,
+                request.prompt,
+                current_user,
+                file_ids
+            )
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=ChatJobService.to_response(job).model_dump(mode="json"),
+                headers={"Location": f"/api/chat/jobs/{job.id}"}
+            )
+
         return await ChatService.send_message(
             db,
             request.session_id,
@@ -208,13 +263,120 @@ async def send_message(
         )
 
 
+# -------------------------
+# Send Message (streaming)
+# -------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/message/stream")
+async def stream_message(
+    request: SendMessageRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Same as POST /message, but relays the answer as Server-Sent Events:
+    `token` events carry {"delta": ...} chunks as they arrive, then one `done`
+    event carries the stored message (SendMessageResponse), or an `error`
+    event carries {"status_code", "detail"} if the RAG call fails.
+    """
+    events = await ChatService.stream_message(
+        db,
+        request.session_id,
+        request.prompt,
+        current_user,
+        request.file_ids or []
+    )
+
+    async def event_stream():
+        try:
+            async for event in events:
+                if event["type"] == "delta":
+                    yield _sse("token", {"delta": event["text"]})
+                else:
+                    message = SendMessageResponse(**event["message"])
+                    yield _sse("done", message.model_dump(mode="json"))
+        except HTTPException as e:
+            yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield _sse("error", {"status_code": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# -------------------------
+# Background Jobs
+# -------------------------
+@router.get("/jobs/{job_id}", response_model=ChatJobResponse)
+async def get_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await ChatJobService.get_job(db, job_id, current_user)
+    return ChatJobService.to_response(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-Sent Events for one job: a `status` event now, then a single
+    `done` event with the finished job (answer or error). An `error` event
+    {"status_code", "detail"} ends the stream instead if the job is deleted
+    or is not finished within CHAT_JOB_EVENTS_TIMEOUT_SECONDS (it may still
+    finish later: poll GET /chat/jobs/{job_id}).
+    """
+    job = await ChatJobService.get_job(db, job_id, current_user)
+    user_id = current_user.id
+
+    async def event_stream():
+        current = ChatJobService.to_response(job)
+        yield _sse("status", current.model_dump(mode="json"))
+
+        deadline = time.monotonic() + settings.CHAT_JOB_EVENTS_TIMEOUT_SECONDS
+        while current.status not in ("succeeded", "failed"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield _sse("error", {
+                    "status_code": status.HTTP_504_GATEWAY_TIMEOUT,
+                    "detail": "Job has not finished yet; poll GET /chat/jobs/{job_id}"
+                })
+                return
+
+            await chat_job_worker.wait_finished(job_id, min(settings.CHAT_JOB_POLL_SECONDS, remaining))
+            async with AsyncSessionLocal() as poll_db:
+                row = await poll_db.scalar(select(ChatJob).where(ChatJob.id == job_id, ChatJob.user_id == user_id))
+            if row is None:
+                yield _sse("error", {"status_code": status.HTTP_404_NOT_FOUND, "detail": "Job not found"})
+                return
+            current = ChatJobService.to_response(row)
+
+        yield _sse("done", current.model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # -------------------------
 # Regenerate Response
 # -------------------------
 @router.post("/message/regenerate", response_model=RegenerateResponseResponse)
 async def regenerate_response(
     request: RegenerateResponseRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     return await ChatService.regenerate_response(
@@ -230,7 +392,7 @@ async def regenerate_response(
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return ChatService.delete_session(db, session_id, current_user)
\ No newline at end of file
+    return await ChatService.delete_session(db, session_id, current_user)
\ No newline at end of file
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime, timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 from app.models.chat_sessions import ChatSession, SessionStatus
 from app.models.chat_messages import ChatMessage
 from app.models.usage_daily import UsageDaily
-from app.models.subject import Subject
-from app.models.grade import Grade
+from app.services.reference_data_service import ReferenceDataService
 from app.schemas.dashboard import (
     DashboardStatsResponse,
     RecentActivityResponse,
     RecentActivityItem,
     CalendarRangeResponse,
     DailyActivityItem,
-    WeeklyActivityResponse
+    WeeklyActivityResponse,
+    ActivityRangeResponse
 )
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
@@ -23,15 +25,15 @@ router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 @router.get("/stats", response_model=DashboardStatsResponse)
 async def get_stats(
     date_param: date = Query(..., description="Date in YYYY-MM-DD format"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get sessions and questions count for a specific date"""
     
-    usage = db.query(UsageDaily).filter(
+    usage = await db.scalar(select(UsageDaily).where(
         UsageDaily.user_id == current_user.id,
         UsageDaily.date == date_param
-    ).first()
+    ))
     
     if usage:
         return DashboardStatsResponse(
@@ -43,41 +45,42 @@ async def get_stats(
 
 @router.get("/recent-activity", response_model=RecentActivityResponse)
 async def get_recent_activity(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     limit: int = 5
 ):
-    """Get recent sessions with preview"""
+    """Get recent sessions with preview (one query; subject/grade from the reference cache)"""
     
-    sessions = db.query(ChatSession).filter(
-        ChatSession.user_id == current_user.id,
-        ChatSession.status == SessionStatus.ACTIVE
-    ).order_by(ChatSession.updated_at.desc()).limit(limit).all()
+    # Latest Q&A prompt per session; an index lookup on (session_id, created_at)
+    last_prompt = (
+        select(func.substr(ChatMessage.prompt, 1, 100))
+        .where(ChatMessage.session_id == ChatSession.id)
+        .order_by(ChatMessage.created_at.desc())
+        .limit(1)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+    
+    rows = (await db.execute(
+        select(ChatSession, last_prompt)
+        .where(
+            ChatSession.user_id == current_user.id,
+            ChatSession.status == SessionStatus.ACTIVE
+        )
+        .order_by(ChatSession.updated_at.desc())
+        .limit(limit)
+    )).all()
     
     activities = []
-    for session in sessions:
-        # Get last message preview (most recent Q&A)
-        last_qa = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at.desc()).first()
-        
-        # Get subject and grade info
-        subject_name = None
-        if session.subject_id:
-            subject = db.query(Subject).filter(Subject.id == session.subject_id).first()
-            subject_name = subject.name if subject else None
-        
-        grade_level = None
-        if session.grade_id:
-            grade = db.query(Grade).filter(Grade.id == session.grade_id).first()
-            grade_level = grade.level if grade else None
-        
+    for session, preview in rows:
+        subject = await ReferenceDataService.subject(session.subject_id)
+        grade = await ReferenceDataService.grade(session.grade_id)
         activities.append(RecentActivityItem(
             session_id=session.id,
             title=session.title,
-            subject_name=subject_name,
-            grade_level=grade_level,
-            last_message_preview=last_qa.prompt[:100] if last_qa else "",
+            subject_name=subject.name if subject else None,
+            grade_level=grade.level if grade else None,
+            last_message_preview=preview or "",
             qa_pairs_count=session.total_qa_pairs,
             updated_at=session.updated_at
         ))
@@ -86,7 +89,7 @@ async def get_recent_activity(
 
 @router.get("/calendar-range", response_model=CalendarRangeResponse)
 async def get_calendar_range(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get first login date and today for calendar initialization"""
@@ -98,26 +101,80 @@ async def get_calendar_range(
         today=date.today()
     )
 
+# Longest range /activity serves in one request
+ACTIVITY_MAX_DAYS = 731
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())  # ISO week, starting Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def _activity_series(db: AsyncSession, user_id, start: date, end: date, bucket: str = "day") -> list[DailyActivityItem]:
+    """Zero-filled sessions/questions per bucket from one range scan of usage_daily"""
+    rows = (await db.execute(
+        select(UsageDaily.date, UsageDaily.sessions_created, UsageDaily.qa_pairs_completed)
+        .where(
+            UsageDaily.user_id == user_id,
+            UsageDaily.date >= start,
+            UsageDaily.date <= end
+        )
+    )).all()
+    
+    # Every bucket in the range, in order, so the UI gets a dense series
+    totals = {}
+    day = start
+    while day <= end:
+        totals.setdefault(_bucket_start(day, bucket), [0, 0])
+        day += timedelta(days=1)
+    
+    for day, sessions, questions in rows:
+        bucket_totals = totals[_bucket_start(day, bucket)]
+        bucket_totals[0] += sessions or 0
+        bucket_totals[1] += questions or 0
+    
+    return [
+        DailyActivityItem(date=key.strftime("%Y-%m-%d"), sessions=sessions, questions=questions)
+        for key, (sessions, questions) in totals.items()
+    ]
+
+@router.get("/activity", response_model=ActivityRangeResponse)
+async def get_activity(
+    from_date: date = Query(..., alias="from", description="First day (YYYY-MM-DD)"),
+    to_date: date = Query(..., alias="to", description="Last day, inclusive (YYYY-MM-DD)"),
+    bucket: Literal["day", "week", "month"] = "day",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get sessions and questions per day/week/month for a date range"""
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must not be before 'from'"
+        )
+    if (to_date - from_date).days + 1 > ACTIVITY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {ACTIVITY_MAX_DAYS} days"
+        )
+    
+    activity = await _activity_series(db, current_user.id, from_date, to_date, bucket)
+    return ActivityRangeResponse(
+        from_date=from_date,
+        to_date=to_date,
+        bucket=bucket,
+        activity=activity
+    )
+
 @router.get("/weekly-activity", response_model=WeeklyActivityResponse)
 async def get_weekly_activity(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get daily sessions and questions count for the last 7 days"""
     today = date.today()
-    activity = []
-    
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        usage = db.query(UsageDaily).filter(
-            UsageDaily.user_id == current_user.id,
-            UsageDaily.date == day
-        ).first()
-        
-        activity.append(DailyActivityItem(
-            date=day.strftime("%Y-%m-%d"),
-            sessions=usage.sessions_created if usage else 0,
-            questions=usage.qa_pairs_completed if usage else 0
-        ))
-        
-    return WeeklyActivityResponse(activity=activity)
\ No newline at end of file
+    activity = await _activity_series(db, current_user.id, today - timedelta(days=6), today)
+    return WeeklyActivityResponse(activity=activity)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 from app.models.feedback import Feedback, FeedbackType
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/feedback", tags=["Feedback"])
 @router.post("", response_model=FeedbackResponse)
 async def submit_feedback(
     feedback_data: FeedbackCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Submit user feedback"""
@@ -24,14 +24,14 @@ async def submit_feedback(
     )
     
     db.add(feedback)
-    db.commit()
+    await db.commit()
     
     return FeedbackResponse(message="Feedback submitted successfully")
 
 @router.post("/contact", response_model=FeedbackResponse)
 async def submit_contact_form(
     contact_data: ContactFormCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit a public contact form message"""
     
@@ -48,6 +48,6 @@ async def submit_contact_form(
     )
     
     db.add(feedback)
-    db.commit()
+    await db.commit()
     
     return FeedbackResponse(message="Contact form submitted successfully")
\ No newline at end of file
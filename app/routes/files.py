@@ -2,9 +2,9 @@ import os
 import uuid
 import shutil
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 from app.models.uploaded_file import UploadedFile
@@ -19,7 +19,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
 async def upload_file(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -52,8 +52,8 @@ async def upload_file(
         )
         
         db.add(uploaded_file)
-        db.commit()
-        db.refresh(uploaded_file)
+        await db.commit()
+        await db.refresh(uploaded_file)
         
         return {
             "file_id": uploaded_file.id,
@@ -63,7 +63,7 @@ async def upload_file(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload file: {str(e)}"
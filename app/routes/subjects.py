@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.subject import Subject
-from app.models.grade import Grade
+from fastapi import APIRouter, Request, Response
+from app.config import settings
+from app.services.reference_data_service import ReferenceDataService
+from app.utils.http_cache import etag_matches, make_etag, not_modified
 from app.schemas.subject import SubjectResponse
 from app.schemas.grade import GradeResponse
 
 router = APIRouter(prefix="/subjects", tags=["Subjects"])
 
+async def _catalog_headers(catalog: str) -> dict:
+    # Public and identical for every user, so browsers and the CDN may cache it;
+    # the ETag follows the reference data version, which is the same on all workers
+    return {
+        "ETag": make_etag(catalog, await ReferenceDataService.version()),
+        "Cache-Control": f"public, max-age={settings.CATALOG_CACHE_MAX_AGE_SECONDS}",
+    }
+
 @router.get("/", response_model=list[SubjectResponse])
-async def get_subjects(db: Session = Depends(get_db)):
-    """Get all active subjects"""
-    subjects = db.query(Subject).filter(Subject.is_active == True).all()
-    return subjects
+async def get_subjects(request: Request, response: Response):
+    """Get all active subjects (from the in-process reference data cache)"""
+    headers = await _catalog_headers("subjects")
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    return await ReferenceDataService.active_subjects()
 
 @router.get("/grades", response_model=list[GradeResponse])
-async def get_grades(db: Session = Depends(get_db)):
-    """Get all grades"""
-    grades = db.query(Grade).order_by(Grade.level).all()
-    return grades
\ No newline at end of file
+async def get_grades(request: Request, response: Response):
+    """Get all grades (from the in-process reference data cache)"""
+    headers = await _catalog_headers("grades")
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    return await ReferenceDataService.grades()
\ No newline at end of file
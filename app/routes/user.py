@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
+from app.services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/user", tags=["User"])
 
@@ -15,7 +17,7 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
     update_data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update user profile"""
@@ -24,10 +26,10 @@ async def update_profile(
         current_user.full_name = update_data.full_name
     if update_data.email:
         # Check if email is already taken by another user
-        existing_user = db.query(User).filter(
+        existing_user = await db.scalar(select(User).where(
             User.email == update_data.email,
             User.id != current_user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -35,28 +37,32 @@ async def update_profile(
             )
         current_user.email = update_data.email
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
+    await db.refresh(current_user)
     
     return current_user
 
 @router.get("/usage")
 async def get_usage_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get user's usage statistics"""
     
-    from app.models.chat import ChatSession, ChatMessage
+    from app.models.chat_sessions import ChatSession
+    from app.models.chat_messages import ChatMessage
     
-    total_sessions = db.query(ChatSession)\
-        .filter(ChatSession.user_id == current_user.id)\
-        .count()
+    total_sessions = await db.scalar(
+        select(func.count(ChatSession.id))
+        .where(ChatSession.user_id == current_user.id)
+    )
     
-    total_messages = db.query(ChatMessage)\
-        .join(ChatSession)\
-        .filter(ChatSession.user_id == current_user.id)\
-        .count()
+    total_messages = await db.scalar(
+        select(func.count(ChatMessage.id))
+        .join(ChatSession)
+        .where(ChatSession.user_id == current_user.id)
+    )
     
     return {
         "total_sessions": total_sessions,
@@ -67,14 +73,15 @@ async def get_usage_stats(
 # ← NEW: Delete Account Endpoint
 @router.delete("/account", status_code=status.HTTP_200_OK)
 async def delete_account(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete user account permanently"""
     
     # Delete user (cascades to chat_sessions, chat_messages, feedbacks)
-    db.delete(current_user)
-    db.commit()
+    await db.delete(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
     
     return {
         "message": "Account deleted successfully",
@@ -154,9 +154,17 @@ class ChatSessionResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ChatSessionList(BaseModel):
+    sessions: List[ChatSessionResponse]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
+
+
 class ChatSessionWithMessages(BaseModel):
     session: ChatSessionResponse
     messages: List[ChatMessageResponse]
+    next_cursor: Optional[str] = None  # earlier Q&A pairs, if any
+    version: Optional[str] = None  # pass as ?since= to fetch only changes
+    delta: bool = False  # messages are only the changes since ?since=
 
     model_config = {"from_attributes": True}
 
@@ -175,4 +183,16 @@ class RegenerateResponseResponse(BaseModel):
     message_id: UUID
     response: str
     response_version: int
-    figures: List[Any] = Field(default_factory=list)
\ No newline at end of file
+    figures: List[Any] = Field(default_factory=list)
+
+
+class ChatJobResponse(BaseModel):
+    job_id: UUID
+    session_id: UUID
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[SendMessageResponse] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
\ No newline at end of file
@@ -29,4 +29,10 @@ class DailyActivityItem(BaseModel):
     questions: int
 
 class WeeklyActivityResponse(BaseModel):
-    activity: list[DailyActivityItem]
\ No newline at end of file
+    activity: list[DailyActivityItem]
+
+class ActivityRangeResponse(BaseModel):
+    from_date: date
+    to_date: date
+    bucket: str
+    activity: list[DailyActivityItem]
@@ -0,0 +1,129 @@
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+
+
+class AnswerCache:
+    """
+    In-process LRU + TTL cache of RAG answers.
+
+    Entries are keyed on (subject_id, grade_id, normalized prompt), so the same
+    textbook question asked in the same subject and grade is answered once per
+    TTL. Each worker keeps its own cache; invalidation only affects the worker
+    that receives the admin request.
+    """
+
+    _whitespace = re.compile(r"\s+")
+
+    # Result fields served from the cache
+    CACHED_FIELDS = (
+        "answer", "figures", "book_id", "route", "selected_rag",
+        "selected_rag_key", "routing_mode", "usage",
+    )
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, result)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def normalize_prompt(cls, prompt: str) -> str:
+        """Case-fold, unify unicode forms and whitespace, drop trailing punctuation"""
+        text = unicodedata.normalize("NFKC", prompt or "").casefold()
+        text = cls._whitespace.sub(" ", text).strip()
+        return text.rstrip(" ?!.")
+
+    @classmethod
+    def make_key(cls, prompt: str, subject_id: Optional[str], grade_id: Optional[str]) -> tuple:
+        return (subject_id or "", grade_id or "", cls.normalize_prompt(prompt))
+
+    @staticmethod
+    def is_cacheable(chat_history: Optional[list]) -> bool:
+        """Only questions whose answer does not depend on a long conversation"""
+        if not settings.ANSWER_CACHE_ENABLED:
+            return False
+        turns = len(chat_history or []) // 2
+        return turns <= settings.ANSWER_CACHE_MAX_HISTORY_TURNS
+
+    def get(self, key: tuple) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, result = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**result, "cached": True}
+
+    def set(self, key: tuple, result: dict) -> None:
+        if not result.get("answer"):
+            return
+
+        # Keep only what a cache hit serves (not the raw router response), and
+        # count the size of exactly that, so max_bytes bounds what is held
+        entry = {field: result.get(field) for field in self.CACHED_FIELDS}
+        size = len(key[2]) + len(json.dumps(entry, default=str))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, entry)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, subject_id: Optional[str] = None, grade_id: Optional[str] = None) -> int:
+        """Drop entries for a subject and/or grade (everything when both are None)"""
+        keys = [
+            key for key in self._entries
+            if (subject_id is None or key[0] == subject_id)
+            and (grade_id is None or key[1] == grade_id)
+        ]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def _remove(self, key: tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ANSWER_CACHE_MAX_BYTES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+)
@@ -1,18 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from app.models.user import User
 from app.schemas.auth import LoginRequest, TokenResponse
 from app.schemas.user import UserCreate, UserResponse
-from app.utils.security import hash_password, verify_password, create_access_token, create_refresh_token
+from app.utils.security import (
+    hash_password_async,
+    verify_password_async,
+    needs_rehash,
+    create_access_token,
+    create_refresh_token
+)
 
 class AuthService:
     
     @staticmethod
-    def register_user(db: Session, user_data: UserCreate) -> dict:
+    async def register_user(db: AsyncSession, user_data: UserCreate) -> dict:
         """Register a new user"""
         
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -22,22 +29,22 @@ class AuthService:
         # Create new user
         new_user = User(
             email=user_data.email,
-            password_hash=hash_password(user_data.password),
+            password_hash=await hash_password_async(user_data.password),
             full_name=user_data.full_name
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         return {"message": "User registered successfully", "user_id": str(new_user.id)}
     
     @staticmethod
-    def login(db: Session, credentials: LoginRequest) -> TokenResponse:
+    async def login(db: AsyncSession, credentials: LoginRequest) -> TokenResponse:
         """Authenticate user and return tokens"""
         
         # Find user
-        user = db.query(User).filter(User.email == credentials.email).first()
+        user = await db.scalar(select(User).where(User.email == credentials.email))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,12 +52,17 @@ class AuthService:
             )
         
         # Verify password
-        if not verify_password(credentials.password, user.password_hash):
+        if not await verify_password_async(credentials.password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
         
+        # Upgrade the hash if BCRYPT_ROUNDS changed since it was made
+        if needs_rehash(user.password_hash):
+            user.password_hash = await hash_password_async(credentials.password)
+            await db.commit()
+        
         # Create tokens
         access_token = create_access_token({"sub": str(user.id)})
         refresh_token = create_refresh_token({"sub": str(user.id)})
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import or_, and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.chat_job import ChatJob, ChatJobStatus
+from app.models.chat_sessions import ChatSession
+from app.models.user import User
+from app.schemas.chat import ChatJobResponse
+from app.services.chat_service import ChatService
+
+logger = logging.getLogger(__name__)
+
+class ChatJobService:
+
+    @staticmethod
+    async def enqueue(db: AsyncSession, session_id: UUID, prompt: str, user: User, file_ids: list[UUID] = None) -> ChatJob:
+        """Queue a prompt to be answered in the background"""
+
+        session = await db.scalar(
+            select(ChatSession.id)
+            .where(ChatSession.id == session_id, ChatSession.user_id == user.id)
+        )
+
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+
+        job = ChatJob(
+            user_id=user.id,
+            session_id=session_id,
+            prompt=prompt,
+            file_ids=[str(file_id) for file_id in file_ids or []],
+            status=ChatJobStatus.QUEUED,
+            attempts=0
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        chat_job_worker.wake()
+        return job
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: UUID, user: User) -> ChatJob:
+        """Get a job owned by the user"""
+
+        job = await db.scalar(
+            select(ChatJob)
+            .where(ChatJob.id == job_id, ChatJob.user_id == user.id)
+        )
+
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+
+        return job
+
+    @staticmethod
+    def to_response(job: ChatJob) -> ChatJobResponse:
+        return ChatJobResponse(
+            job_id=job.id,
+            session_id=job.session_id,
+            status=job.status.value,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            result=job.result,
+            error=job.error,
+            error_status=job.error_status
+        )
+
+    @staticmethod
+    def is_finished(job: ChatJob) -> bool:
+        return job.status in (ChatJobStatus.SUCCEEDED, ChatJobStatus.FAILED)
+
+
+class ChatJobWorker:
+    """
+    Runs queued chat jobs inside the API process.
+
+    Jobs are durable rows in chat_jobs. Each loop claims the oldest queued job
+    with SELECT ... FOR UPDATE SKIP LOCKED, so several workers (or processes)
+    never pick the same row. A job left "running" for longer than
+    CHAT_JOB_STALE_SECONDS (its worker died) is claimed again, up to
+    CHAT_JOB_MAX_ATTEMPTS attempts.
+    """
+
+    def __init__(self):
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._finished: dict = {}  # job_id -> [asyncio.Event, listener count]
+
+    async def start(self) -> None:
+        if self._tasks or not settings.CHAT_JOB_WORKER_ENABLED:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"chat-job-worker-{i}")
+            for i in range(settings.CHAT_JOB_CONCURRENCY)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def wait_finished(self, job_id: UUID, timeout: float) -> None:
+        """Wait until this process finishes the job, or `timeout` seconds pass"""
+        entry = self._finished.get(job_id)
+        if entry is None:
+            entry = self._finished[job_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._finished.get(job_id) is entry:
+                del self._finished[job_id]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                ran = await self._run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Chat job worker iteration failed")
+                ran = False
+
+            if not ran:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.CHAT_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    @staticmethod
+    async def _claim(db: AsyncSession) -> Optional[ChatJob]:
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.CHAT_JOB_STALE_SECONDS)
+        job = await db.scalar(
+            select(ChatJob)
+            .where(or_(
+                ChatJob.status == ChatJobStatus.QUEUED,
+                and_(ChatJob.status == ChatJobStatus.RUNNING, ChatJob.started_at < stale_before)
+            ))
+            .order_by(ChatJob.created_at.asc())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+
+        if not job:
+            await db.rollback()
+            return None
+
+        if job.attempts >= settings.CHAT_JOB_MAX_ATTEMPTS:
+            job.status = ChatJobStatus.FAILED
+            job.error = "Job was interrupted too many times"
+            job.error_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = ChatJobStatus.RUNNING
+            job.attempts += 1
+            job.started_at = datetime.utcnow()
+        await db.commit()
+        return job
+
+    async def _run_next(self) -> bool:
+        """Claim and run one job; returns False when the queue is empty"""
+        async with AsyncSessionLocal() as db:
+            job = await self._claim(db)
+            if job is None:
+                return False
+            if job.status != ChatJobStatus.RUNNING:
+                self._notify(job.id)
+                return True
+
+            job_id = job.id
+            try:
+                user = await db.get(User, job.user_id)
+                if user is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="User no longer exists"
+                    )
+                # Marks the job succeeded in the Q&A row's own transaction
+                await ChatService.send_message(
+                    db,
+                    job.session_id,
+                    job.prompt,
+                    user,
+                    [UUID(file_id) for file_id in job.file_ids or []],
+                    job_id=job_id
+                )
+                self._notify(job_id)
+                return True
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next start picks it up,
+                # unless its answer was already committed
+                await db.rollback()
+                await db.execute(
+                    update(ChatJob)
+                    .where(ChatJob.id == job_id, ChatJob.status == ChatJobStatus.RUNNING)
+                    .values(status=ChatJobStatus.QUEUED)
+                )
+                await db.commit()
+                raise
+            except HTTPException as e:
+                await db.rollback()
+                error, error_status = str(e.detail), e.status_code
+            except Exception as e:
+                await db.rollback()
+                logger.exception("Chat job %s failed", job_id)
+                error, error_status = str(e), status.HTTP_500_INTERNAL_SERVER_ERROR
+
+            # An UPDATE, not a reload: the row may have been deleted meanwhile
+            await db.execute(
+                update(ChatJob)
+                .where(ChatJob.id == job_id)
+                .values(
+                    status=ChatJobStatus.FAILED,
+                    error=error,
+                    error_status=error_status,
+                    finished_at=datetime.utcnow()
+                )
+            )
+            await db.commit()
+            self._notify(job_id)
+            return True
+
+    def _notify(self, job_id: UUID) -> None:
+        entry = self._finished.get(job_id)
+        if entry is not None:
+            entry[0].set()
+
+
+chat_job_worker = ChatJobWorker()
@@ -1,25 +1,61 @@
-from sqlalchemy.orm import Session
+import time
+from typing import AsyncIterator
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from fastapi import HTTPException, status
 from uuid import UUID
 from datetime import datetime
+from app.database import AsyncSessionLocal
 from app.models.chat_sessions import ChatSession, SessionStatus
 from app.models.chat_messages import ChatMessage
+from app.models.chat_job import ChatJob, ChatJobStatus
 from app.models.user import User
-from app.models.subject import Subject
-from app.models.grade import Grade
 from app.models.usage_daily import UsageDaily
 from app.models.uploaded_file import UploadedFile
 from app.models.message_attachment import MessageAttachment
+from app.schemas.chat import SendMessageResponse
+from app.services.history_service import HistoryService
 from app.services.rag_service import RAGService
+from app.services.reference_data_service import ReferenceDataService
+from app.utils.metrics import LatencyWindow
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    DELTA_OVERLAP,
+    encode_cursor,
+    keyset_before,
+    parse_since,
+    version_token
+)
+from app.utils.tokens import estimate_tokens
+
+# Columns the session list returns (ChatSessionResponse)
+SESSION_LIST_COLUMNS = (
+    ChatSession.title,
+    ChatSession.subject_id,
+    ChatSession.grade_id,
+    ChatSession.total_qa_pairs,
+    ChatSession.status,
+    ChatSession.created_at,
+    ChatSession.updated_at,
+)
 
 class ChatService:
     
+    # Per-phase latency of answered messages on this worker (admin metrics)
+    phase_latency = {
+        "queue": LatencyWindow(),
+        "upstream": LatencyWindow(),
+        "persist": LatencyWindow(),
+    }
+    
     @staticmethod
-    def create_session(db: Session, user: User, subject_id: UUID, grade_id: UUID) -> ChatSession:
+    async def create_session(db: AsyncSession, user: User, subject_id: UUID, grade_id: UUID) -> ChatSession:
         """Create a new chat session with subject and grade"""
         
         # Verify subject exists
-        subject = db.query(Subject).filter(Subject.id == subject_id).first()
+        subject = await ReferenceDataService.subject(subject_id)
         if not subject:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +63,7 @@ class ChatService:
             )
         
         # Verify grade exists
-        grade = db.query(Grade).filter(Grade.id == grade_id).first()
+        grade = await ReferenceDataService.grade(grade_id)
         if not grade:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -43,50 +79,155 @@ class ChatService:
             total_qa_pairs=0
         )
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await ChatService._bump_daily_usage(db, user.id, sessions_created=1)
+        await db.commit()
+        await db.refresh(session)
         return session
     
     @staticmethod
-    def get_user_sessions(db: Session, user: User) -> list[ChatSession]:
-        """Get all chat sessions for a user"""
-        
-        sessions = db.query(ChatSession)\
-            .filter(ChatSession.user_id == user.id, ChatSession.status == SessionStatus.ACTIVE)\
-            .order_by(ChatSession.updated_at.desc())\
-            .all()
-        return sessions
+    async def _bump_daily_usage(db: AsyncSession, user_id: UUID, **counts: int):
+        """Add to today's usage_daily counters in one upsert (no read, no lost increments)"""
+        now = datetime.utcnow()
+        values = {"sessions_created": 0, "qa_pairs_completed": 0, "files_uploaded": 0, "tokens_used": 0, **counts}
+        stmt = pg_insert(UsageDaily).values(user_id=user_id, date=now.date(), updated_at=now, **values)
+        increments = {
+            name: func.coalesce(getattr(UsageDaily, name), 0) + stmt.excluded[name]
+            for name in counts
+        }
+        await db.execute(stmt.on_conflict_do_update(
+            constraint="uq_usage_daily_user_id_date",
+            set_={**increments, "updated_at": stmt.excluded.updated_at}
+        ))
+    
+    @staticmethod
+    async def get_user_sessions(
+        db: AsyncSession,
+        user: User,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None
+    ) -> tuple[list[ChatSession], str | None]:
+        """
+        One page of a user's sessions, most recently updated first.
+        
+        Returns the sessions and the cursor of the next page (None on the last
+        page). Only the listed columns are loaded.
+        """
+        
+        query = (
+            select(ChatSession)
+            .options(load_only(*SESSION_LIST_COLUMNS))
+            .where(ChatSession.user_id == user.id, ChatSession.status == SessionStatus.ACTIVE)
+            .order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            query = query.where(keyset_before(ChatSession.updated_at, ChatSession.id, cursor))
+        
+        sessions = (await db.scalars(query)).all()
+        if len(sessions) <= limit:
+            return sessions, None
+        sessions = sessions[:limit]
+        return sessions, encode_cursor(sessions[-1].updated_at, sessions[-1].id)
+    
+    @staticmethod
+    def session_version(session: ChatSession) -> str:
+        """Version token of a session's transcript (changes on new and regenerated Q&A)"""
+        return version_token(session.total_qa_pairs, session.updated_at)
     
     @staticmethod
-    def get_session_with_messages(db: Session, session_id: UUID, user: User):
-        """Get a specific session with all Q&A pairs"""
+    async def get_owned_session(db: AsyncSession, session_id: UUID, user: User) -> ChatSession:
+        """The user's session, or 404"""
         
-        session = db.query(ChatSession)\
-            .filter(ChatSession.id == session_id, ChatSession.user_id == user.id)\
-            .first()
+        session = await db.scalar(
+            select(ChatSession)
+            .where(ChatSession.id == session_id, ChatSession.user_id == user.id)
+        )
         
         if not session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found"
             )
+        return session
+    
+    @staticmethod
+    async def get_session_with_messages(
+        db: AsyncSession,
+        session: ChatSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+        since: str | None = None
+    ):
+        """
+        Get a session with one page of its Q&A pairs.
+        
+        Pages go backwards from the newest Q&A (what a chat view shows first);
+        each page is in chronological order and next_cursor fetches the
+        earlier page.
+        
+        With since (a version token or timestamp) only Q&A pairs created or
+        regenerated after it are returned and delta is true; if that is more
+        than one page, the latest page is returned instead (delta false).
+        """
+        
+        session_id = session.id
+        version = ChatService.session_version(session)
+        if since:
+            if since == version:
+                return {"session": session, "messages": [], "next_cursor": None, "version": version, "delta": True}
+            
+            changed = (await db.scalars(
+                select(ChatMessage)
+                .where(
+                    ChatMessage.session_id == session_id,
+                    ChatMessage.updated_at > parse_since(since) - DELTA_OVERLAP
+                )
+                .order_by(ChatMessage.updated_at.asc())
+                .limit(limit + 1)
+            )).all()
+            if len(changed) <= limit:
+                changed = sorted(changed, key=lambda qa: (qa.created_at, qa.id))
+                return {"session": session, "messages": changed, "next_cursor": None, "version": version, "delta": True}
+        
+        # One row per Q&A pair, newest first, one extra to know if there is more
+        query = (
+            select(ChatMessage)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            query = query.where(keyset_before(ChatMessage.created_at, ChatMessage.id, cursor))
+        
+        messages = (await db.scalars(query)).all()
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
         
-        # Get all Q&A messages (one row per Q&A pair)
-        messages = db.query(ChatMessage)\
-            .filter(ChatMessage.session_id == session_id)\
-            .order_by(ChatMessage.created_at.asc())\
-            .all()
+        return {"session": session, "messages": messages[::-1], "next_cursor": next_cursor, "version": version, "delta": False}
+    
+    @staticmethod
+    async def _plan_priority(user: User) -> int:
+        """RAG admission priority for the user's plan (pricier plans go first)"""
         
-        return {"session": session, "messages": messages}
+        plan = await ReferenceDataService.plan(user.subscription_tier)
+        return plan.price_monthly_pkr if plan else 0
     
     @staticmethod
-    async def send_message(db: Session, session_id: UUID, prompt: str, user: User, file_ids: list[UUID] = None) -> dict:
-        """Send a prompt and get AI response (stores as one Q&A row)"""
+    async def _load_chat_context(db: AsyncSession, session_id: UUID, user: User) -> dict:
+        """
+        Load the session, its subject/grade and the Q&A history for a RAG call.
+        
+        This is the read phase of a message: it ends its transaction, so the
+        connection goes back to the pool before the (slow) RAG phase starts.
+        """
         
         # Verify session belongs to user
-        session = db.query(ChatSession)\
-            .filter(ChatSession.id == session_id, ChatSession.user_id == user.id)\
-            .first()
+        session = await db.scalar(
+            select(ChatSession)
+            .where(ChatSession.id == session_id, ChatSession.user_id == user.id)
+        )
         
         if not session:
             raise HTTPException(
@@ -95,40 +236,104 @@ class ChatService:
             )
         
         # Get subject and grade info for context
-        subject = db.query(Subject).filter(Subject.id == session.subject_id).first()
-        grade = db.query(Grade).filter(Grade.id == session.grade_id).first()
+        subject = await ReferenceDataService.subject(session.subject_id)
+        grade = await ReferenceDataService.grade(session.grade_id)
         
         # Build system context
         grade_level = grade.level if grade else "unknown"
         subject_name = subject.name if subject else "various subjects"
         system_context = f"You are a tutor helping a {grade_level}th grade student with {subject_name}. Provide clear, educational responses."
         
-        # Get previous Q&A pairs for context
-        previous_qa = db.query(ChatMessage)\
-            .filter(ChatMessage.session_id == session_id)\
-            .order_by(ChatMessage.created_at.asc())\
-            .all()
+        rag_kwargs = {
+            "session_id": str(session.id),
+            "subject_id": str(subject.id) if subject else None,
+            "subject_name": subject.name if subject else None,
+            "grade_id": str(grade.id) if grade else None,
+            "grade_level": grade.level if grade else None,
+            "priority": await ChatService._plan_priority(user),
+            "pinned_route": session.rag_route,
+        }
         
-        # Format history for AI
-        chat_history = []
-        for qa in previous_qa:
-            chat_history.append({"role": "user", "content": qa.prompt})
-            chat_history.append({"role": "assistant", "content": qa.response})
+        # Recent Q&A turns within the token budget + summary of older ones
+        # (may commit, so it runs after everything above has been read)
+        history = await HistoryService.build_history(db, session.id)
+        rag_kwargs["chat_history"] = history["chat_history"]
+        rag_kwargs["system_context"] = HistoryService.with_summary(system_context, history["summary"])
         
-        # Call RAG service with selected grade + subject from this chat session
-        rag_service = RAGService()
-        rag_result = await rag_service.get_answer(
-            question=prompt,
-            chat_history=chat_history,
-            system_context=system_context,
-            session_id=str(session.id),
-            subject_id=str(subject.id) if subject else None,
-            subject_name=subject.name if subject else None,
-            grade_id=str(grade.id) if grade else None,
-            grade_level=grade.level if grade else None,
-        )
+        # End the read transaction so no pooled connection is held during the RAG call
+        await db.commit()
+        
+        return {"session": session, "rag_kwargs": rag_kwargs}
+    
+    @staticmethod
+    def _token_usage(rag_kwargs: dict, prompt: str, rag_result: dict) -> dict:
+        """Token counts reported by the RAG router, or estimated locally"""
+        
+        # A cached or coalesced answer cost no inference (the request that
+        # reached the router was billed for it)
+        if rag_result.get("cached") or rag_result.get("coalesced"):
+            return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        
+        usage = rag_result.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(prompt) + estimate_tokens(rag_kwargs.get("system_context") or "")
+            prompt_tokens += sum(estimate_tokens(turn["content"]) for turn in rag_kwargs.get("chat_history") or [])
+        
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(rag_result.get("answer", ""))
+        
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": usage.get("total_tokens") or prompt_tokens + completion_tokens,
+        }
+    
+    @staticmethod
+    def _call_metadata(rag_result: dict) -> dict:
+        """
+        Timing split, cache/coalesced flags and route stored in
+        ChatMessage.message_metadata (persist_ms is added by _record_persist_ms).
+        """
+        
+        timings = rag_result.get("timings") or {"queue_ms": 0, "upstream_ms": 0}
+        ChatService.phase_latency["queue"].add(timings["queue_ms"] / 1000)
+        ChatService.phase_latency["upstream"].add(timings["upstream_ms"] / 1000)
+        return {
+            "timings": timings,
+            "cached": bool(rag_result.get("cached")),
+            "coalesced": bool(rag_result.get("coalesced")),
+            "route": RAGService.route_of(rag_result),
+        }
+    
+    @staticmethod
+    async def _record_persist_ms(db: AsyncSession, qa: ChatMessage, metadata: dict, persist_started: float) -> None:
+        """
+        Flush the write phase, then store its duration as timings["persist_ms"].
+        Only the COMMIT round trip is left out.
+        """
+        await db.flush()
+        persist_ms = round((time.monotonic() - persist_started) * 1000)
+        # A new dict, not an in-place change: the JSON column only sees reassignment
+        qa.message_metadata = {**metadata, "timings": {**metadata["timings"], "persist_ms": persist_ms}}
+    
+    @staticmethod
+    async def _save_answer(db: AsyncSession, session_id: UUID, prompt: str, user: User, rag_result: dict, tokens: dict, file_ids: list[UUID] = None, job_id: UUID = None) -> dict:
+        """
+        Store a completed Q&A row and update session + daily usage counters.
+        
+        With job_id the background job is marked succeeded in the same
+        transaction, so a crash after the commit can never answer (and bill)
+        the job twice.
+        """
+        
+        persist_started = time.monotonic()
         response = rag_result.get("answer", "")
         figures = rag_result.get("figures", [])
+        metadata = ChatService._call_metadata(rag_result)
+        # Re-read: the copy loaded before the RAG call may be minutes old
+        session = await db.get(ChatSession, session_id, populate_existing=True)
         
         # Save Q&A as one row
         new_qa = ChatMessage(
@@ -137,21 +342,26 @@ class ChatService:
             response=response,
             response_version=1,
             previous_responses=None,
+            prompt_tokens=tokens["prompt_tokens"],
+            completion_tokens=tokens["completion_tokens"],
+            total_tokens=tokens["total_tokens"],
+            latency_ms=metadata["timings"]["queue_ms"] + metadata["timings"]["upstream_ms"],
+            message_metadata=metadata,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
         db.add(new_qa)
-        db.flush() # Flush to get the new_qa.id for attachments
+        await db.flush() # Flush to get the new_qa.id for attachments
         
         # Link files to the message
-        files_count = 0
+        attachments = []
         if file_ids:
             for file_id in file_ids:
                 # Verify file exists and belongs to user
-                uploaded_file = db.query(UploadedFile).filter(
+                uploaded_file = await db.scalar(select(UploadedFile).where(
                     UploadedFile.id == file_id,
                     UploadedFile.user_id == user.id
-                ).first()
+                ))
                 
                 if uploaded_file:
                     attachment = MessageAttachment(
@@ -159,11 +369,15 @@ class ChatService:
                         file_id=file_id
                     )
                     db.add(attachment)
+                    attachments.append(attachment)
                     uploaded_file.is_processed = True
-                    files_count += 1
+        files_count = len(attachments)
         
-        # Update session
-        session.total_qa_pairs += 1
+        # Update session (counters are incremented in SQL, not read-modify-write in Python)
+        session.total_qa_pairs = func.coalesce(ChatSession.total_qa_pairs, 0) + 1
+        session.total_tokens_used = func.coalesce(ChatSession.total_tokens_used, 0) + tokens["total_tokens"]
+        if metadata["route"] and metadata["route"] != session.rag_route:
+            session.rag_route = metadata["route"]
         session.updated_at = datetime.utcnow()
         
         # Update session title with first prompt (if not set)
@@ -171,30 +385,14 @@ class ChatService:
             session.title = prompt[:50] + ("..." if len(prompt) > 50 else "")
         
         # Update usage_daily
-        today = datetime.utcnow().date()
-        usage = db.query(UsageDaily).filter(
-            UsageDaily.user_id == user.id,
-            UsageDaily.date == today
-        ).first()
-        
-        if usage:
-            usage.qa_pairs_completed += 1
-            usage.files_uploaded += files_count
-            usage.updated_at = datetime.utcnow()
-        else:
-            usage = UsageDaily(
-                user_id=user.id,
-                date=today,
-                sessions_created=1,
-                qa_pairs_completed=1,
-                files_uploaded=files_count
-            )
-            db.add(usage)
-        
-        db.commit()
-        db.refresh(new_qa)
+        await ChatService._bump_daily_usage(
+            db, user.id,
+            qa_pairs_completed=1,
+            files_uploaded=files_count,
+            tokens_used=tokens["total_tokens"]
+        )
         
-        return {
+        result = {
             "message_id": new_qa.id,
             "session_id": session_id,
             "prompt": prompt,
@@ -202,15 +400,86 @@ class ChatService:
             "response_version": 1,
             "created_at": new_qa.created_at,
             "figures": figures,
-            "attachments": new_qa.attachments
+            "attachments": attachments
         }
+        if job_id is not None:
+            await db.execute(
+                update(ChatJob)
+                .where(ChatJob.id == job_id)
+                .values(
+                    status=ChatJobStatus.SUCCEEDED,
+                    result=SendMessageResponse(**result).model_dump(mode="json"),
+                    finished_at=datetime.utcnow()
+                )
+            )
+        
+        await ChatService._record_persist_ms(db, new_qa, metadata, persist_started)
+        await db.commit()
+        ChatService.phase_latency["persist"].add(time.monotonic() - persist_started)
+        
+        return result
+    
+    @staticmethod
+    async def send_message(db: AsyncSession, session_id: UUID, prompt: str, user: User, file_ids: list[UUID] = None, job_id: UUID = None) -> dict:
+        """
+        Send a prompt and get AI response (stores as one Q&A row).
+        
+        Runs as a short read transaction, the RAG call with no connection
+        checked out, then a short write transaction.
+        """
+        
+        context = await ChatService._load_chat_context(db, session_id, user)
+        
+        # Call RAG service with selected grade + subject from this chat session
+        rag_service = RAGService()
+        rag_result = await rag_service.get_answer(question=prompt, **context["rag_kwargs"])
+        tokens = ChatService._token_usage(context["rag_kwargs"], prompt, rag_result)
+        
+        return await ChatService._save_answer(db, session_id, prompt, user, rag_result, tokens, file_ids, job_id)
+    
+    @staticmethod
+    async def stream_message(db: AsyncSession, session_id: UUID, prompt: str, user: User, file_ids: list[UUID] = None) -> AsyncIterator[dict]:
+        """
+        Send a prompt and stream the AI response as it is generated.
+        
+        The session is validated up front (so a bad session_id is a plain 404),
+        then the returned iterator yields {"type": "delta", "text": ...} events
+        and a final {"type": "done", "message": ...} once the Q&A row is stored.
+        The request-scoped db session is closed before a streaming response body
+        runs, so the Q&A row is written through a fresh session.
+        """
+        
+        context = await ChatService._load_chat_context(db, session_id, user)
+        rag_kwargs = context["rag_kwargs"]
+        
+        async def events():
+            rag_service = RAGService()
+            rag_result = None
+            async for event in rag_service.stream_answer(question=prompt, **rag_kwargs):
+                if event["type"] == "delta":
+                    yield event
+                else:
+                    rag_result = event["result"]
+            
+            tokens = ChatService._token_usage(rag_kwargs, prompt, rag_result)
+            async with AsyncSessionLocal() as write_db:
+                message = await ChatService._save_answer(write_db, session_id, prompt, user, rag_result, tokens, file_ids)
+            
+            yield {"type": "done", "message": message}
+        
+        return events()
     
     @staticmethod
-    async def regenerate_response(db: Session, message_id: UUID, user: User) -> dict:
-        """Regenerate a response for an existing prompt"""
+    async def regenerate_response(db: AsyncSession, message_id: UUID, user: User) -> dict:
+        """
+        Regenerate a response for an existing prompt.
+        
+        Like send_message: read phase, RAG call with no connection held, then
+        a write phase that re-reads the Q&A row under a row lock.
+        """
         
         # Get the Q&A pair
-        qa = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+        qa = await db.get(ChatMessage, message_id)
         if not qa:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -218,10 +487,10 @@ class ChatService:
             )
         
         # Verify session belongs to user
-        session = db.query(ChatSession).filter(
+        session = await db.scalar(select(ChatSession).where(
             ChatSession.id == qa.session_id,
             ChatSession.user_id == user.id
-        ).first()
+        ))
         
         if not session:
             raise HTTPException(
@@ -230,25 +499,14 @@ class ChatService:
             )
         
         # Get subject and grade for context
-        subject = db.query(Subject).filter(Subject.id == session.subject_id).first()
-        grade = db.query(Grade).filter(Grade.id == session.grade_id).first()
+        subject = await ReferenceDataService.subject(session.subject_id)
+        grade = await ReferenceDataService.grade(session.grade_id)
         
         grade_level = grade.level if grade else "unknown"
         subject_name = subject.name if subject else "various subjects"
         system_context = f"You are a tutor helping a {grade_level}th grade student with {subject_name}. Provide clear, educational responses."
         
-        # Save current response to previous_responses
-        previous_responses = qa.previous_responses or []
-        previous_responses.append({
-            "version": qa.response_version,
-            "response": qa.response,
-            "created_at": datetime.utcnow().isoformat()
-        })
-        
-        # Call RAG service for new response with the same selected grade + subject
-        rag_service = RAGService()
-        rag_result = await rag_service.get_answer(
-            question=qa.prompt,
+        rag_kwargs = dict(
             chat_history=[],
             system_context=system_context,
             session_id=str(session.id),
@@ -256,17 +514,64 @@ class ChatService:
             subject_name=subject.name if subject else None,
             grade_id=str(grade.id) if grade else None,
             grade_level=grade.level if grade else None,
+            priority=await ChatService._plan_priority(user),
+            pinned_route=session.rag_route,
         )
+        prompt = qa.prompt
+        
+        # Read phase done: don't hold a connection while the router works
+        await db.commit()
+        
+        # Call RAG service for new response with the same selected grade + subject
+        rag_service = RAGService()
+        rag_result = await rag_service.get_answer(question=prompt, fresh=True, **rag_kwargs)
         new_response = rag_result.get("answer", "")
         figures = rag_result.get("figures", [])
         
-        # Update the Q&A pair
+        persist_started = time.monotonic()
+        tokens = ChatService._token_usage(rag_kwargs, prompt, rag_result)
+        metadata = ChatService._call_metadata(rag_result)
+        
+        # Write phase: lock and re-read the rows changed since the read phase
+        qa = await db.get(ChatMessage, message_id, populate_existing=True, with_for_update=True)
+        if not qa:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+        session = await db.get(ChatSession, qa.session_id, populate_existing=True)
+        
+        # Save current response to previous_responses
+        previous_responses = list(qa.previous_responses or [])
+        previous_responses.append({
+            "version": qa.response_version,
+            "response": qa.response,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        
+        # Update the Q&A pair; token columns describe the current response
         qa.previous_responses = previous_responses
         qa.response_version += 1
         qa.response = new_response
+        qa.prompt_tokens = tokens["prompt_tokens"]
+        qa.completion_tokens = tokens["completion_tokens"]
+        qa.total_tokens = tokens["total_tokens"]
+        qa.latency_ms = metadata["timings"]["queue_ms"] + metadata["timings"]["upstream_ms"]
+        qa.message_metadata = metadata
         qa.updated_at = datetime.utcnow()
         
-        db.commit()
+        # A regenerated answer is a transcript change: bump the session version
+        session.updated_at = qa.updated_at
+        
+        # Regenerations still cost tokens, so they count towards the totals
+        session.total_tokens_used = func.coalesce(ChatSession.total_tokens_used, 0) + tokens["total_tokens"]
+        if metadata["route"] and metadata["route"] != session.rag_route:
+            session.rag_route = metadata["route"]
+        await ChatService._bump_daily_usage(db, user.id, tokens_used=tokens["total_tokens"])
+        
+        await ChatService._record_persist_ms(db, qa, metadata, persist_started)
+        await db.commit()
+        ChatService.phase_latency["persist"].add(time.monotonic() - persist_started)
         
         return {
             "message_id": qa.id,
@@ -276,12 +581,13 @@ class ChatService:
         }
     
     @staticmethod
-    def delete_session(db: Session, session_id: UUID, user: User):
+    async def delete_session(db: AsyncSession, session_id: UUID, user: User):
         """Soft delete a chat session (mark as deleted)"""
         
-        session = db.query(ChatSession)\
-            .filter(ChatSession.id == session_id, ChatSession.user_id == user.id)\
-            .first()
+        session = await db.scalar(
+            select(ChatSession)
+            .where(ChatSession.id == session_id, ChatSession.user_id == user.id)
+        )
         
         if not session:
             raise HTTPException(
@@ -292,6 +598,6 @@ class ChatService:
         # Soft delete - mark as deleted
         session.status = SessionStatus.DELETED
         session.updated_at = datetime.utcnow()
-        db.commit()
+        await db.commit()
         
         return {"message": "Session deleted successfully"}
\ No newline at end of file
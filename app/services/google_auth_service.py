@@ -1,27 +1,47 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from sqlalchemy.orm import Session
+import asyncio
+from google.auth import jwt as google_jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from app.config import settings
 from app.models.user import User
 from app.schemas.user import UserResponse
 from app.schemas.google_auth import GoogleAuthResponse
+from app.utils.google_certs import CertCache, KeySource, http_key_source, token_key_id
 from app.utils.security import create_access_token, create_refresh_token
 
 class GoogleAuthService:
     
+    # Google's signing certificates, fetched only when their cache lifetime ends
+    certs = CertCache(http_key_source(settings.GOOGLE_CERTS_URL))
+    
+    @staticmethod
+    def use_key_source(source: KeySource) -> None:
+        """Verify against another issuer's keys (e.g. a local stand-in in tests)"""
+        GoogleAuthService.certs = CertCache(source)
+    
     @staticmethod
-    def verify_google_token(token: str) -> dict:
-        """Verify Google ID token and return user info"""
+    async def verify_google_token(token: str) -> dict:
+        """Verify Google ID token locally against the cached certificates and return user info"""
+        try:
+            certs = await GoogleAuthService.certs.get(token_key_id(token))
+        except Exception:  # no certificates at all: the issuer is unreachable
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Google sign-in is temporarily unavailable. Please try again."
+            )
+        
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                requests.Request(), 
-                settings.GOOGLE_CLIENT_ID,
+            # Signature check is CPU work; keep it off the event loop
+            idinfo = await asyncio.to_thread(
+                google_jwt.decode,
+                token,
+                certs=certs,
+                audience=settings.GOOGLE_CLIENT_ID,
                 clock_skew_in_seconds=60
             )
             
-            if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
+            if idinfo['iss'] not in settings.GOOGLE_TOKEN_ISSUERS.split(","):
                 raise ValueError('Wrong issuer.')
             
             return {
@@ -39,17 +59,17 @@ class GoogleAuthService:
             )
     
     @staticmethod
-    def authenticate_google_user(db: Session, token: str) -> GoogleAuthResponse:
+    async def authenticate_google_user(db: AsyncSession, token: str) -> GoogleAuthResponse:
         """Authenticate user with Google token"""
         
-        user_info = GoogleAuthService.verify_google_token(token)
+        user_info = await GoogleAuthService.verify_google_token(token)
         
         # Check if user exists by Google ID
-        user = db.query(User).filter(User.google_id == user_info['google_id']).first()
+        user = await db.scalar(select(User).where(User.google_id == user_info['google_id']))
         
         if not user:
             # Check if user exists by email (maybe registered with email/password)
-            user = db.query(User).filter(User.email == user_info['email']).first()
+            user = await db.scalar(select(User).where(User.email == user_info['email']))
             
             if user:
                 # Link existing account with Google
@@ -77,14 +97,14 @@ class GoogleAuthService:
                 )
                 db.add(user)
             
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         else:
             # ✅ FIX: For existing users, ensure role is not None
             if user.role is None:
                 user.role = 'student'
-                db.commit()
-                db.refresh(user)
+                await db.commit()
+                await db.refresh(user)
         
         # Create tokens
         access_token = create_access_token({"sub": str(user.id)})
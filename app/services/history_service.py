@@ -0,0 +1,126 @@
+import re
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.chat_messages import ChatMessage
+from app.models.system_message import SystemMessage
+from app.utils.tokens import estimate_tokens
+
+class HistoryService:
+    """
+    Builds the chat history sent to the RAG router.
+
+    Only the most recent Q&A turns that fit CHAT_HISTORY_TOKEN_BUDGET are sent
+    verbatim. Turns that fall out of that window are folded, once, into a
+    rolling summary stored as the session's SystemMessage, so each request
+    reads a bounded number of rows however long the session gets.
+    """
+
+    _sentence_end = re.compile(r"(?<=[.!?])\s")
+
+    @staticmethod
+    def _shorten(text: str, limit: int) -> str:
+        text = " ".join((text or "").split())
+        return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+    @staticmethod
+    def _summary_line(qa: ChatMessage) -> str:
+        """One extractive line per turn: the question and the answer's first sentence"""
+
+        answer = " ".join((qa.response or "").split())
+        first_sentence = HistoryService._sentence_end.split(answer, maxsplit=1)[0]
+        return f"- Q: {HistoryService._shorten(qa.prompt, 160)} A: {HistoryService._shorten(first_sentence, 200)}"
+
+    @staticmethod
+    def _fit_summary(lines: list[str]) -> str:
+        """Keep the newest summary lines that fit CHAT_SUMMARY_TOKEN_BUDGET"""
+
+        kept = []
+        used = 0
+        for line in reversed(lines):
+            cost = estimate_tokens(line)
+            if kept and used + cost > settings.CHAT_SUMMARY_TOKEN_BUDGET:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
+
+    @staticmethod
+    async def build_history(db: AsyncSession, session_id: UUID) -> dict:
+        """
+        Return {"chat_history": [...], "summary": str | None} for a session.
+
+        Commits when the rolling summary had to be extended.
+        """
+
+        summary = await db.scalar(
+            select(SystemMessage)
+            .where(SystemMessage.session_id == session_id)
+            .order_by(SystemMessage.created_at.desc())
+            .limit(1)
+        )
+
+        # Newest turns first, never re-reading turns already in the summary
+        query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+        if summary and summary.summarized_until:
+            query = query.where(ChatMessage.created_at > summary.summarized_until)
+        recent = (await db.scalars(
+            query.order_by(ChatMessage.created_at.desc())
+            .limit(settings.CHAT_HISTORY_MAX_TURNS)
+        )).all()
+
+        window = []
+        used = 0
+        budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+        for qa in recent:
+            prompt_tokens = estimate_tokens(qa.prompt)
+            response_tokens = estimate_tokens(qa.response)
+            if window and used + prompt_tokens + response_tokens > budget:
+                break
+            response = qa.response
+            if not window and prompt_tokens + response_tokens > budget:
+                # The latest turn alone is too long: keep its question, trim the answer
+                keep_chars = max(0, budget - prompt_tokens) * 4
+                response = HistoryService._shorten(response, max(keep_chars, 200))
+            window.append((qa, response))
+            used += prompt_tokens + response_tokens
+        window.reverse()
+
+        # Fold turns older than the window into the rolling summary
+        if window:
+            older = select(ChatMessage)\
+                .where(ChatMessage.session_id == session_id, ChatMessage.created_at < window[0][0].created_at)
+            if summary and summary.summarized_until:
+                older = older.where(ChatMessage.created_at > summary.summarized_until)
+            older = (await db.scalars(older.order_by(ChatMessage.created_at.asc()))).all()
+
+            if older:
+                lines = summary.content.splitlines() if summary else []
+                lines.extend(HistoryService._summary_line(qa) for qa in older)
+                if not summary:
+                    summary = SystemMessage(session_id=session_id, turns_summarized=0)
+                    db.add(summary)
+                summary.content = HistoryService._fit_summary(lines)
+                summary.summarized_until = older[-1].created_at
+                summary.turns_summarized = (summary.turns_summarized or 0) + len(older)
+                await db.commit()
+
+        chat_history = []
+        for qa, response in window:
+            chat_history.append({"role": "user", "content": qa.prompt})
+            chat_history.append({"role": "assistant", "content": response})
+
+        return {
+            "chat_history": chat_history,
+            "summary": summary.content if summary else None,
+        }
+
+    @staticmethod
+    def with_summary(system_context: str, summary: Optional[str]) -> str:
+        """Append the rolling summary to the tutor system context"""
+
+        if not summary:
+            return system_context
+        return f"{system_context}\n\nSummary of the earlier conversation:\n{summary}"
@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.user import User
+
+
+class PrincipalCache:
+    """
+    In-process LRU + TTL cache of authenticated users, keyed on user id.
+
+    The JWT is still verified on every request; this only saves the users
+    lookup that follows it. Entries are column snapshots, and every hit builds
+    a fresh User attached to the request's session without a SELECT, so
+    routes can read, update or delete it as before.
+
+    Each worker keeps its own cache: writes to a user invalidate the entry on
+    the worker that made them, other workers pick the change up within the
+    TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # user id -> (expires_at, column values)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, db: AsyncSession, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, values = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        user = User(**values)
+        make_transient_to_detached(user)
+        db.add(user)
+        return user
+
+    def set(self, user: User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        self._entries[str(user.id)] = (time.monotonic() + self.ttl_seconds, values)
+        self._entries.move_to_end(str(user.id))
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id) -> None:
+        """Drop a user after their row changed (profile update, deletion, login)"""
+        self._entries.pop(str(user_id), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
@@ -1,17 +1,278 @@
-from typing import Optional
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
 
 import httpx
 from app.config import settings
+from app.services.answer_cache import answer_cache
+from app.utils.admission import AdmissionController, AdmissionRejected
+from app.utils.load_balancer import Upstream, UpstreamPool
+from app.utils.metrics import LatencyWindow
+from app.utils.resilience import CircuitBreaker, CircuitBreakerOpen, RetryBudget, backoff_delay
+from app.utils.singleflight import SingleFlight
 from fastapi import HTTPException
 
+# Failures where the request never reached the router, so retrying is safe
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Routing decision returned by the router, pinned per chat session
+ROUTE_FIELDS = ("route", "selected_rag", "selected_rag_key", "book_id", "routing_mode")
+
+
+def _build_upstreams() -> UpstreamPool:
+    urls = [url.strip() for url in settings.RAG_API_URLS.split(",") if url.strip()] or [settings.RAG_API_URL]
+    upstreams = []
+    for url in urls:
+        stream_url = url.rstrip("/") + "/stream"
+        if len(urls) == 1 and settings.RAG_STREAM_URL:
+            stream_url = settings.RAG_STREAM_URL
+        health_url = UpstreamPool.origin(url) + settings.RAG_HEALTH_PATH
+        upstreams.append(Upstream(url, stream_url, health_url))
+
+    return UpstreamPool(
+        upstreams,
+        eject_after=settings.RAG_EJECT_CONSECUTIVE_FAILURES,
+        eject_seconds=settings.RAG_EJECT_SECONDS,
+        health_interval=settings.RAG_HEALTH_INTERVAL_SECONDS,
+        health_timeout=settings.RAG_HEALTH_TIMEOUT_SECONDS,
+        health_headers={"X-API-Key": settings.RAG_API_KEY},
+    )
+
 
 class RAGService:
     """Service to interact with the external RAG router API."""
 
+    # One pooled client per worker, opened/closed by the app lifespan hook
+    _client: Optional[httpx.AsyncClient] = None
+
+    # Router replicas, balanced by outstanding requests / latency
+    upstreams = _build_upstreams()
+
+    # Identical concurrent first-turn questions share one upstream call
+    inflight = SingleFlight()
+
+    # Bound concurrent router calls; paid tiers are admitted first
+    admission = AdmissionController(
+        limit=settings.RAG_MAX_CONCURRENCY,
+        max_wait=settings.RAG_QUEUE_TIMEOUT_SECONDS,
+    )
+
+    # Fail fast while the router is down instead of tying up workers
+    breaker = CircuitBreaker(
+        failure_threshold=settings.RAG_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.RAG_BREAKER_RESET_SECONDS,
+        half_open_max_calls=settings.RAG_BREAKER_HALF_OPEN_MAX_CALLS,
+    )
+    retry_budget = RetryBudget(
+        ratio=settings.RAG_RETRY_BUDGET_RATIO,
+        max_tokens=settings.RAG_RETRY_BUDGET_MAX_TOKENS,
+    )
+
+    # Recent call latencies per subject (timeouts count at their deadline), used for read timeouts
+    latencies: dict = {}
+
     def __init__(self):
-        self.api_url = settings.RAG_API_URL
         self.api_key = settings.RAG_API_KEY
 
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=settings.RAG_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.RAG_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.RAG_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.RAG_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.RAG_CONNECT_TIMEOUT,
+                read=settings.RAG_READ_TIMEOUT,
+                write=settings.RAG_WRITE_TIMEOUT,
+                pool=settings.RAG_POOL_TIMEOUT,
+            ),
+        )
+
+    @classmethod
+    async def startup(cls) -> None:
+        """Open the shared HTTP client and start upstream health checks (FastAPI lifespan)."""
+        if cls._client is None:
+            cls._client = cls._build_client()
+        cls.upstreams.start_health_checks(cls._client)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Stop health checks, close the shared HTTP client and drain its pool."""
+        await cls.upstreams.stop_health_checks()
+        if cls._client is not None:
+            client, cls._client = cls._client, None
+            await client.aclose()
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """
+        Return the shared client.
+
+        Falls back to opening one lazily so scripts and tests that never run
+        the lifespan hook keep working.
+        """
+        if cls._client is None or cls._client.is_closed:
+            cls._client = cls._build_client()
+        return cls._client
+
+    @classmethod
+    def _latency_window(cls, subject_id: Optional[str]) -> LatencyWindow:
+        key = subject_id or ""
+        if key not in cls.latencies:
+            cls.latencies[key] = LatencyWindow()
+        return cls.latencies[key]
+
+    @classmethod
+    def _timeout_for(cls, subject_id: Optional[str]) -> httpx.Timeout:
+        """
+        Read timeout derived from the subject's observed latency percentile
+        (times a safety multiplier), clamped to [RAG_TIMEOUT_MIN_SECONDS,
+        RAG_READ_TIMEOUT]. Until enough samples exist RAG_READ_TIMEOUT is used.
+        """
+        read = settings.RAG_READ_TIMEOUT
+        window = cls._latency_window(subject_id)
+        if len(window) >= settings.RAG_TIMEOUT_MIN_SAMPLES:
+            observed = window.percentile(settings.RAG_TIMEOUT_PERCENTILE) * settings.RAG_TIMEOUT_MULTIPLIER
+            read = min(settings.RAG_READ_TIMEOUT, max(settings.RAG_TIMEOUT_MIN_SECONDS, observed))
+
+        return httpx.Timeout(
+            connect=settings.RAG_CONNECT_TIMEOUT,
+            read=read,
+            write=settings.RAG_WRITE_TIMEOUT,
+            pool=settings.RAG_POOL_TIMEOUT,
+        )
+
+    @classmethod
+    def _record_timeout(cls, subject_id: Optional[str], timeout: httpx.Timeout) -> None:
+        """
+        Count a read timeout as a sample at the deadline it hit, so after a
+        slowdown the deadline climbs back up instead of cutting off every
+        slower answer.
+        """
+        cls._latency_window(subject_id).add(timeout.read)
+
+    @staticmethod
+    def _is_upstream_failure(exc: Exception) -> bool:
+        """Errors that count against the circuit breaker (not 4xx)"""
+        return not isinstance(exc, HTTPException) or exc.status_code >= 500
+
+    @classmethod
+    def _breaker_open_exception(cls, exc: CircuitBreakerOpen) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="RAG server is currently offline. Please try again after some time.",
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        )
+
+    @staticmethod
+    def _overloaded_exception(exc: AdmissionRejected) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="STEAMX is very busy right now. Please try again in a moment.",
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        )
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "admission": cls.admission.stats(),
+            "breaker": cls.breaker.stats(),
+            "retry_budget": cls.retry_budget.stats(),
+            "coalescing": cls.inflight.stats(),
+            "upstreams": cls.upstreams.stats(),
+            "latency_by_subject": {
+                subject_id or "none": {
+                    **window.summary(),
+                    "read_timeout_s": cls._timeout_for(subject_id).read,
+                }
+                for subject_id, window in cls.latencies.items()
+            },
+        }
+
+    @staticmethod
+    def _build_payload(
+        question: str,
+        chat_history: Optional[list],
+        system_context: Optional[str],
+        session_id: Optional[str],
+        subject_id: Optional[str],
+        subject_name: Optional[str],
+        grade_id: Optional[str],
+        grade_level: Optional[int],
+        pinned_route: Optional[dict] = None,
+    ) -> dict:
+        payload = {
+            "query": question,
+            "session_id": session_id,
+            "chat_history": chat_history or [],
+            "system_context": system_context,
+            "subject_id": subject_id,
+            "subject_name": subject_name,
+            "grade_id": grade_id,
+            "grade_level": grade_level,
+        }
+        if pinned_route:
+            # Route chosen earlier in the session; the router can skip classification
+            payload["pinned_route"] = pinned_route
+        return payload
+
+    @staticmethod
+    def route_of(result: dict) -> Optional[dict]:
+        """The router's routing decision in a result, if it made one"""
+        route = {key: result.get(key) for key in ROUTE_FIELDS if result.get(key) is not None}
+        return route if route.get("selected_rag_key") else None
+
+    @staticmethod
+    def _build_result(data: dict, answer: Optional[str] = None) -> dict:
+        return {
+            "answer": answer or data.get("answer") or data.get("response") or str(data),
+            "figures": data.get("figures", []),
+            "book_id": data.get("book_id"),
+            "route": data.get("route"),
+            "selected_rag": data.get("selected_rag"),
+            "selected_rag_key": data.get("selected_rag_key"),
+            "routing_mode": data.get("routing_mode"),
+            "usage": data.get("usage") if isinstance(data.get("usage"), dict) else None,
+            "raw": data,
+        }
+
+    @staticmethod
+    def _timings(queued: float, started: float) -> dict:
+        return {
+            "queue_ms": round(queued * 1000),
+            "upstream_ms": round((time.monotonic() - started) * 1000),
+        }
+
+    @staticmethod
+    def _to_http_exception(exc: Exception) -> HTTPException:
+        """Map an httpx (or unexpected) error to the API error we return."""
+        if isinstance(exc, HTTPException):
+            return exc
+        if isinstance(exc, httpx.TimeoutException):
+            return HTTPException(
+                status_code=504,
+                detail="RAG API request timed out",
+            )
+        if isinstance(exc, httpx.RequestError):
+            return HTTPException(
+                status_code=503,
+                detail="RAG server is currently offline. Please try again after some time.",
+            )
+        if isinstance(exc, httpx.HTTPStatusError):
+            return HTTPException(
+                status_code=exc.response.status_code,
+                detail=f"RAG API error: {exc.response.text}",
+            )
+        return HTTPException(
+            status_code=500,
+            detail=f"Error calling RAG: {str(exc)}",
+        )
+
     async def get_answer(
         self,
         question: str,
@@ -22,6 +283,9 @@ class RAGService:
         subject_name: Optional[str] = None,
         grade_id: Optional[str] = None,
         grade_level: Optional[int] = None,
+        priority: int = 0,
+        fresh: bool = False,
+        pinned_route: Optional[dict] = None,
     ) -> dict:
         """
         Call the RAG router API and pass the selected grade + subject.
@@ -30,64 +294,233 @@ class RAGService:
         ChatService loads those values from DB and sends them here.
         This service forwards them to router_server.py so the router can activate
         the correct RAG from subject button selection.
+
+        Questions with no (or little) chat history are answered from the
+        answer cache when the same subject + grade + prompt was seen recently,
+        and identical first-turn questions arriving together share one call.
+        `fresh=True` (regenerate) skips both and always asks the router; the
+        new answer still replaces the cached one. Calls that do reach the
+        router wait for an admission slot; a higher `priority` (paid plans) is
+        admitted first. `pinned_route` (see route_of) is sent back so the
+        router can reuse the RAG it picked on an earlier turn.
+
+        The result carries the router's token "usage" (if it reports one) and
+        "timings" {"queue_ms", "upstream_ms"} of the call that reached the
+        router (zeros for cached answers). Callers that shared another
+        request's call get its result marked "coalesced": True.
         """
-        payload = {
-            "query": question,
-            "session_id": session_id,
-            "chat_history": chat_history or [],
-            "system_context": system_context,
-            "subject_id": subject_id,
-            "subject_name": subject_name,
-            "grade_id": grade_id,
-            "grade_level": grade_level,
-        }
+        cacheable = answer_cache.is_cacheable(chat_history)
+        coalesce = settings.RAG_COALESCE_ENABLED and not chat_history and not fresh
+        key = answer_cache.make_key(question, subject_id, grade_id)
 
-        async with httpx.AsyncClient() as client:
+        if cacheable and not fresh:
+            cached = answer_cache.get(key)
+            if cached is not None:
+                return {**cached, "timings": {"queue_ms": 0, "upstream_ms": 0}}
+
+        payload = self._build_payload(
+            question, chat_history, system_context, session_id,
+            subject_id, subject_name, grade_id, grade_level, pinned_route,
+        )
+
+        async def fetch() -> dict:
+            try:
+                async with self.admission.slot(priority) as queued:
+                    started = time.monotonic()
+                    result = await self.breaker.call(
+                        lambda: self._fetch_answer(payload, subject_id),
+                        is_failure=self._is_upstream_failure,
+                    )
+                    result["timings"] = self._timings(queued, started)
+            except AdmissionRejected as e:
+                raise self._overloaded_exception(e)
+            except CircuitBreakerOpen as e:
+                raise self._breaker_open_exception(e)
+            if cacheable:
+                answer_cache.set(key, result)
+            return result
+
+        if coalesce:
+            return await self.inflight.do(key, fetch)
+        return await fetch()
+
+    async def _fetch_answer(self, payload: dict, subject_id: Optional[str] = None) -> dict:
+        """
+        POST one question to the RAG router.
+
+        Connection failures (the request never reached the router) are retried
+        with jittered backoff, within the shared retry budget, on another
+        upstream when one is left to try.
+        """
+        client = self.get_client()
+        self.retry_budget.deposit()
+        attempt = 0
+        tried = []
+
+        while True:
+            timeout = self._timeout_for(subject_id)
+            upstream = self.upstreams.pick(exclude=tuple(tried))
+            tried.append(upstream)
+            started = time.monotonic()
             try:
-                response = await client.post(
-                    self.api_url,
+                with self.upstreams.track(upstream):
+                    response = await client.post(
+                        upstream.url,
+                        headers={
+                            "Content-Type": "application/json",
+                            "X-API-Key": self.api_key,
+                        },
+                        json=payload,
+                        timeout=timeout,
+                    )
+
+                response.raise_for_status()
+                result = self._build_result(response.json())
+
+            except RETRYABLE_ERRORS as e:
+                self.upstreams.on_failure(upstream)
+                if attempt < settings.RAG_RETRY_MAX_ATTEMPTS and self.retry_budget.withdraw():
+                    attempt += 1
+                    if len(tried) >= len(self.upstreams.upstreams):
+                        # Every replica has failed once: back off before going round again
+                        tried.clear()
+                        await asyncio.sleep(backoff_delay(attempt, settings.RAG_RETRY_BASE_DELAY, settings.RAG_RETRY_MAX_DELAY))
+                    continue
+                raise self._to_http_exception(e)
+
+            except Exception as e:
+                if isinstance(e, httpx.ReadTimeout):
+                    self._record_timeout(subject_id, timeout)
+                error = self._to_http_exception(e)
+                if self._is_upstream_failure(error):
+                    self.upstreams.on_failure(upstream)
+                raise error
+
+            elapsed = time.monotonic() - started
+            self.upstreams.on_success(upstream, elapsed)
+            self._latency_window(subject_id).add(elapsed)
+            return result
+
+    async def stream_answer(
+        self,
+        question: str,
+        chat_history: Optional[list] = None,
+        system_context: Optional[str] = None,
+        session_id: Optional[str] = None,
+        subject_id: Optional[str] = None,
+        subject_name: Optional[str] = None,
+        grade_id: Optional[str] = None,
+        grade_level: Optional[int] = None,
+        priority: int = 0,
+        pinned_route: Optional[dict] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream an answer from the RAG router's streaming endpoint.
+
+        Yields {"type": "delta", "text": ...} for every chunk as it arrives and
+        finishes with {"type": "done", "result": ...}, where result has the same
+        shape as get_answer() (including "usage" and "timings"). The router may
+        send SSE ("data: {...}") or newline-delimited JSON; chunks that are not
+        JSON are treated as text.
+        A cached answer is replayed as a single chunk.
+        """
+        cache_key = None
+        if answer_cache.is_cacheable(chat_history):
+            cache_key = answer_cache.make_key(question, subject_id, grade_id)
+            cached = answer_cache.get(cache_key)
+            if cached is not None:
+                yield {"type": "delta", "text": cached["answer"]}
+                yield {"type": "done", "result": {**cached, "timings": {"queue_ms": 0, "upstream_ms": 0}}}
+                return
+
+        payload = self._build_payload(
+            question, chat_history, system_context, session_id,
+            subject_id, subject_name, grade_id, grade_level, pinned_route,
+        )
+        payload["stream"] = True
+
+        try:
+            async with self.admission.slot(priority) as queued, aclosing(self._stream_upstream(payload, subject_id)) as events:
+                started = time.monotonic()
+                async for event in events:
+                    if event["type"] == "done":
+                        event["result"]["timings"] = self._timings(queued, started)
+                        if cache_key is not None:
+                            answer_cache.set(cache_key, event["result"])
+                    yield event
+        except AdmissionRejected as e:
+            raise self._overloaded_exception(e)
+
+    async def _stream_upstream(self, payload: dict, subject_id: Optional[str]) -> AsyncIterator[dict]:
+        """Open the router's streaming endpoint and relay its chunks"""
+        try:
+            self.breaker.acquire()
+        except CircuitBreakerOpen as e:
+            raise self._breaker_open_exception(e)
+
+        client = self.get_client()
+        upstream = self.upstreams.pick()
+        timeout = self._timeout_for(subject_id)
+        parts = []
+        final = {}
+        try:
+            with self.upstreams.track(upstream):
+                async with client.stream(
+                    "POST",
+                    upstream.stream_url,
                     headers={
                         "Content-Type": "application/json",
+                        "Accept": "text/event-stream",
                         "X-API-Key": self.api_key,
                     },
                     json=payload,
-                    timeout=180.0,
-                )
+                    timeout=timeout,
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
 
-                response.raise_for_status()
-                data = response.json()
-
-                return {
-                    "answer": data.get("answer") or data.get("response") or str(data),
-                    "figures": data.get("figures", []),
-                    "book_id": data.get("book_id"),
-                    "route": data.get("route"),
-                    "selected_rag": data.get("selected_rag"),
-                    "selected_rag_key": data.get("selected_rag_key"),
-                    "routing_mode": data.get("routing_mode"),
-                    "raw": data,
-                }
+                    async for line in response.aiter_lines():
+                        line = line.strip()
+                        if not line or line.startswith(":") or line.startswith("event:"):
+                            continue
+                        if line.startswith("data:"):
+                            line = line[5:].strip()
+                        if line == "[DONE]":
+                            break
 
-            except httpx.TimeoutException:
-                raise HTTPException(
-                    status_code=504,
-                    detail="RAG API request timed out",
-                )
+                        try:
+                            chunk = json.loads(line)
+                        except ValueError:
+                            chunk = {"delta": line}
+                        if not isinstance(chunk, dict):
+                            chunk = {"delta": str(chunk)}
 
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=503,
-                    detail="RAG server is currently offline. Please try again after some time.",
-                )
+                        text = chunk.get("delta") or chunk.get("token") or chunk.get("content")
+                        if text:
+                            parts.append(text)
+                            yield {"type": "delta", "text": text}
 
-            except httpx.HTTPStatusError as e:
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"RAG API error: {e.response.text}",
-                )
+                        if chunk.get("done") or "answer" in chunk:
+                            final = chunk
+                            break
 
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error calling RAG: {str(e)}",
-                )
+        except Exception as e:
+            if isinstance(e, httpx.ReadTimeout):
+                self._record_timeout(subject_id, timeout)
+            error = self._to_http_exception(e)
+            if self._is_upstream_failure(error):
+                self.breaker.on_failure()
+                self.upstreams.on_failure(upstream)
+            else:
+                self.breaker.on_success()
+            raise error
+        except BaseException:
+            # Client went away mid-stream: no verdict on the router's health
+            self.breaker.release()
+            raise
+
+        self.breaker.on_success()
+        self.upstreams.on_success(upstream)
+
+        yield {"type": "done", "result": self._build_result(final, answer="".join(parts))}
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Optional
+from uuid import UUID
+import asyncpg
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.subject import Subject
+from app.models.grade import Grade
+from app.models.subscription_plan import SubscriptionPlan
+
+logger = logging.getLogger(__name__)
+
+# Channel the triggers on subjects / grades / subscription_plans notify
+CHANGE_CHANNEL = "reference_data_changed"
+
+# An unknown id reloads the cache at most this often (new rows before the next refresh)
+MISS_RELOAD_INTERVAL_SECONDS = 5.0
+LISTEN_RETRY_SECONDS = 5.0
+
+
+class ReferenceDataService:
+    """
+    In-process cache of subjects, grades and subscription plans.
+
+    Loaded at startup and replaced as a whole when it is older than
+    REFERENCE_DATA_TTL_SECONDS or when Postgres notifies a change. Cached
+    rows are detached ORM objects shared by every request: read them, never
+    add them to a session.
+    """
+
+    _data: Optional[dict] = None
+    _loaded_at = 0.0
+    _lock = asyncio.Lock()
+    _listen_task: Optional[asyncio.Task] = None
+    loads = 0
+    misses = 0
+
+    @classmethod
+    async def startup(cls) -> None:
+        """Load the cache and start listening for changes (FastAPI lifespan)."""
+        try:
+            await cls.load()
+        except Exception:
+            logger.exception("Could not load reference data at startup; loading on first use")
+        if settings.REFERENCE_DATA_LISTEN and not settings.DATABASE_PGBOUNCER and cls._listen_task is None:
+            cls._listen_task = asyncio.create_task(cls._listen_loop(), name="reference-data-listener")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        task, cls._listen_task = cls._listen_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    @classmethod
+    async def load(cls) -> None:
+        """Read all reference rows and swap them in"""
+        async with AsyncSessionLocal() as db:
+            subjects = (await db.scalars(select(Subject))).all()
+            grades = (await db.scalars(select(Grade).order_by(Grade.level))).all()
+            plans = (await db.scalars(select(SubscriptionPlan))).all()
+
+        cls._data = {
+            "subjects": {subject.id: subject for subject in subjects},
+            "grades": {grade.id: grade for grade in grades},
+            "plans": {plan.slug: plan for plan in plans},
+            "version": cls._version(subjects, grades, plans),
+        }
+        cls._loaded_at = time.monotonic()
+        cls.loads += 1
+
+    @staticmethod
+    def _version(*tables) -> str:
+        """Content hash, so every worker with the same data has the same version"""
+        digest = hashlib.sha1()
+        for rows in tables:
+            for row in sorted(rows, key=lambda row: str(row.id)):
+                values = [getattr(row, column.key) for column in row.__table__.columns]
+                digest.update(repr(values).encode())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    async def _current(cls) -> dict:
+        if cls._data is None or time.monotonic() - cls._loaded_at > settings.REFERENCE_DATA_TTL_SECONDS:
+            async with cls._lock:
+                # Another request may have reloaded while this one waited
+                if cls._data is None or time.monotonic() - cls._loaded_at > settings.REFERENCE_DATA_TTL_SECONDS:
+                    await cls.load()
+        return cls._data
+
+    @classmethod
+    async def _lookup(cls, table: str, key):
+        row = (await cls._current())[table].get(key)
+        if row is None and key is not None:
+            cls.misses += 1
+            if time.monotonic() - cls._loaded_at > MISS_RELOAD_INTERVAL_SECONDS:
+                async with cls._lock:
+                    if time.monotonic() - cls._loaded_at > MISS_RELOAD_INTERVAL_SECONDS:
+                        await cls.load()
+                row = cls._data[table].get(key)
+        return row
+
+    @classmethod
+    async def subject(cls, subject_id: Optional[UUID]) -> Optional[Subject]:
+        return await cls._lookup("subjects", subject_id)
+
+    @classmethod
+    async def grade(cls, grade_id: Optional[UUID]) -> Optional[Grade]:
+        return await cls._lookup("grades", grade_id)
+
+    @classmethod
+    async def plan(cls, slug: Optional[str]) -> Optional[SubscriptionPlan]:
+        return await cls._lookup("plans", slug)
+
+    @classmethod
+    async def active_subjects(cls) -> list[Subject]:
+        subjects = (await cls._current())["subjects"].values()
+        return sorted((s for s in subjects if s.is_active), key=lambda s: s.name)
+
+    @classmethod
+    async def grades(cls) -> list[Grade]:
+        return list((await cls._current())["grades"].values())
+
+    @classmethod
+    async def version(cls) -> str:
+        return (await cls._current())["version"]
+
+    @staticmethod
+    def _listen_dsn() -> str:
+        # asyncpg takes libpq-style DSNs, minus the options it does not know
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        query = dict(url.query)
+        query.pop("channel_binding", None)
+        return url.set(query=query).render_as_string(hide_password=False)
+
+    @classmethod
+    async def _listen_loop(cls) -> None:
+        """Reload on NOTIFY; reconnects (and reloads) if the listen connection drops"""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(cls._listen_dsn())
+                changed = asyncio.Event()
+                await conn.add_listener(CHANGE_CHANNEL, lambda *args: changed.set())
+                await cls.load()  # changes made while not listening
+                while not conn.is_closed():
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=LISTEN_RETRY_SECONDS)
+                    except asyncio.TimeoutError:
+                        continue
+                    changed.clear()
+                    async with cls._lock:
+                        await cls.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Reference data listener failed (%s); retrying", exc)
+            finally:
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    @classmethod
+    def stats(cls) -> dict:
+        data = cls._data or {"subjects": {}, "grades": {}, "plans": {}, "version": None}
+        return {
+            "version": data["version"],
+            "subjects": len(data["subjects"]),
+            "grades": len(data["grades"]),
+            "plans": len(data["plans"]),
+            "age_seconds": round(time.monotonic() - cls._loaded_at, 1) if cls._data else None,
+            "listening": cls._listen_task is not None and not cls._listen_task.done(),
+            "loads": cls.loads,
+            "misses": cls.misses,
+        }
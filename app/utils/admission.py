@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.utils.metrics import LatencyWindow
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed instead of queued"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("too many concurrent requests")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a priority queue and load shedding.
+
+    At most `limit` calls run at once. Further callers wait in a queue ordered
+    by priority (higher first, FIFO within a priority). A caller is rejected
+    with AdmissionRejected when its estimated wait (queue position x average
+    call duration / limit) or its actual wait exceeds `max_wait` seconds.
+    """
+
+    def __init__(self, limit: int, max_wait: float):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._active = 0
+        self._queue: list = []  # heap of (-priority, seq, future)
+        self._seq = itertools.count()
+        self._avg_duration: Optional[float] = None
+        self.waits = LatencyWindow()
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._queue if not fut.done())
+
+    def _estimated_wait(self, priority: int) -> float:
+        if self._avg_duration is None:
+            return 0.0
+        ahead = sum(1 for neg, _, fut in self._queue if -neg >= priority and not fut.done())
+        return (ahead + 1) * self._avg_duration / self.limit
+
+    async def acquire(self, priority: int = 0) -> float:
+        """Wait for a slot; returns the seconds spent queued"""
+        if self._active < self.limit and not self.queued:
+            self._active += 1
+            self.admitted += 1
+            self.waits.add(0.0)
+            return 0.0
+
+        estimate = self._estimated_wait(priority)
+        if estimate > self.max_wait:
+            self.shed += 1
+            raise AdmissionRejected(estimate)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (-priority, next(self._seq), fut))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise AdmissionRejected(self._estimated_wait(priority) or self.max_wait)
+            raise
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.waits.add(waited)
+        return waited
+
+    def release(self) -> None:
+        """Hand the slot to the highest-priority waiter, or free it"""
+        while self._queue:
+            _, _, fut = heapq.heappop(self._queue)
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0) -> AsyncIterator[float]:
+        waited = await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            duration = time.monotonic() - started
+            if self._avg_duration is None:
+                self._avg_duration = duration
+            else:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self._active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_call_ms": round(self._avg_duration * 1000) if self._avg_duration is not None else None,
+            "queue_wait": self.waits.summary(),
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import base64
+import json
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+# A key source returns (certificates by key id, seconds they may be cached for)
+KeySource = Callable[[], Awaitable[tuple[dict, float]]]
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_lifetime(response: httpx.Response, default: float) -> float:
+    """Seconds left from Cache-Control max-age minus Age (default if absent)"""
+    match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+    if not match:
+        return default
+    try:
+        age = int(response.headers.get("age", "0"))
+    except ValueError:
+        age = 0
+    return max(0.0, float(match.group(1)) - age)
+
+
+def http_key_source(url: str, timeout: float = 5.0, default_max_age: float = 300.0) -> KeySource:
+    """Fetch a {kid: PEM certificate} document over HTTP (Google's oauth2/v1/certs format)"""
+    client: Optional[httpx.AsyncClient] = None
+
+    async def fetch() -> tuple[dict, float]:
+        nonlocal client
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=timeout)
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.json(), cache_lifetime(response, default_max_age)
+
+    return fetch
+
+
+def token_key_id(token: str) -> Optional[str]:
+    """kid from a JWT header, without verifying anything"""
+    try:
+        header = token.split(".")[0]
+        return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+    except (ValueError, AttributeError):
+        return None
+
+
+class CertCache:
+    """
+    Signing certificates of an ID token issuer, cached until the issuer's
+    Cache-Control expiry.
+
+    One refresh runs at a time; concurrent callers wait for it. A token signed
+    with a key id we do not have triggers an early refresh (keys are rotated
+    before the old ones expire), at most once every `min_refresh_interval`.
+    """
+
+    def __init__(self, source: KeySource, min_refresh_interval: float = 30.0):
+        self.source = source
+        self.min_refresh_interval = min_refresh_interval
+        self._certs: dict = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    async def _refresh(self) -> None:
+        try:
+            certs, max_age = await self.source()
+        except Exception:
+            self.fetch_errors += 1
+            if not self._certs:
+                raise
+            # Keep serving the certificates we have; try again a bit later
+            self._expires_at = time.monotonic() + self.min_refresh_interval
+            return
+        self._certs = certs
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+        self.fetches += 1
+
+    async def get(self, key_id: Optional[str] = None) -> dict:
+        """Current certificates, refreshed if expired or missing key_id"""
+        if time.monotonic() >= self._expires_at or (key_id and key_id not in self._certs):
+            async with self._lock:
+                now = time.monotonic()
+                expired = now >= self._expires_at
+                unknown_key = key_id and key_id not in self._certs and now - self._fetched_at >= self.min_refresh_interval
+                if expired or unknown_key:
+                    await self._refresh()
+        return self._certs
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._certs),
+            "expires_in_seconds": round(max(0.0, self._expires_at - time.monotonic()), 1) if self._certs else None,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+        }
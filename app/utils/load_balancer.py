@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class Upstream:
+    """One replica behind the load balancer, with its live counters"""
+
+    def __init__(self, url: str, stream_url: str, health_url: str):
+        self.url = url
+        self.stream_url = stream_url
+        self.health_url = health_url
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.healthy = True  # last active health check
+        self.ejected_until = 0.0  # passive ejection after consecutive errors
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and not self.ejected
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "ejected_for_s": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "outstanding": self.outstanding,
+            "ewma_latency_ms": round(self.ewma_latency * 1000) if self.ewma_latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+
+class UpstreamPool:
+    """
+    Client-side load balancing over several replicas of the same service.
+
+    pick() chooses the available upstream with the fewest outstanding
+    requests, breaking ties by EWMA latency. An upstream is skipped while its
+    last active health check failed, or for `eject_seconds` after
+    `eject_after` consecutive errors (passive ejection). When every upstream
+    is out, the ones that are not ejected are tried first, then all of them,
+    rather than failing outright.
+
+    Health probes carry `health_headers` (the same auth as real requests);
+    a 404 means the service has no health endpoint, not that it is down.
+    """
+
+    def __init__(
+        self,
+        upstreams: list[Upstream],
+        eject_after: int,
+        eject_seconds: float,
+        health_interval: float,
+        health_timeout: float,
+        health_headers: Optional[dict] = None,
+        ewma_alpha: float = 0.3,
+    ):
+        self.upstreams = upstreams
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.health_headers = health_headers or {}
+        self.ewma_alpha = ewma_alpha
+        self._health_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def pick(self, exclude: tuple = ()) -> Upstream:
+        """Least outstanding requests, then lowest EWMA latency"""
+        remaining = [u for u in self.upstreams if u not in exclude] or self.upstreams
+        candidates = (
+            [u for u in remaining if u.available]
+            or [u for u in remaining if not u.ejected]
+            or remaining
+        )
+        return min(
+            candidates,
+            key=lambda u: (u.outstanding, u.ewma_latency if u.ewma_latency is not None else 0.0),
+        )
+
+    @contextmanager
+    def track(self, upstream: Upstream) -> Iterator[Upstream]:
+        upstream.outstanding += 1
+        upstream.requests += 1
+        try:
+            yield upstream
+        finally:
+            upstream.outstanding -= 1
+
+    def on_success(self, upstream: Upstream, seconds: Optional[float] = None) -> None:
+        upstream.consecutive_failures = 0
+        if seconds is not None:
+            if upstream.ewma_latency is None:
+                upstream.ewma_latency = seconds
+            else:
+                upstream.ewma_latency += self.ewma_alpha * (seconds - upstream.ewma_latency)
+
+    def on_failure(self, upstream: Upstream) -> None:
+        upstream.failures += 1
+        upstream.consecutive_failures += 1
+        if upstream.consecutive_failures >= self.eject_after and not upstream.ejected:
+            upstream.ejected_until = time.monotonic() + self.eject_seconds
+            upstream.ejections += 1
+            logger.warning("Ejecting upstream %s after %d errors", upstream.url, upstream.consecutive_failures)
+
+    async def check_health(self, client: httpx.AsyncClient) -> None:
+        """Probe every upstream once; a passing probe also ends an ejection"""
+
+        async def probe(upstream: Upstream) -> None:
+            try:
+                response = await client.get(upstream.health_url, headers=self.health_headers, timeout=self.health_timeout)
+                healthy = response.is_success or response.status_code == 404
+            except httpx.HTTPError:
+                healthy = False
+            if healthy != upstream.healthy:
+                logger.warning("Upstream %s is now %s", upstream.url, "healthy" if healthy else "unhealthy")
+            upstream.healthy = healthy
+            if healthy:
+                upstream.ejected_until = 0.0
+                upstream.consecutive_failures = 0
+
+        await asyncio.gather(*(probe(u) for u in self.upstreams))
+
+    async def _health_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                await self.check_health(client)
+            except Exception:
+                logger.exception("Upstream health check failed")
+            await asyncio.sleep(self.health_interval)
+
+    def start_health_checks(self, client: httpx.AsyncClient) -> None:
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop(client), name="upstream-health-checks")
+
+    async def stop_health_checks(self) -> None:
+        task, self._health_task = self._health_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> list[dict]:
+        return [u.stats() for u in self.upstreams]
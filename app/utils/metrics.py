@@ -0,0 +1,36 @@
+import math
+from collections import deque
+from typing import Optional
+
+
+class LatencyWindow:
+    """Fixed-size window of recent latency samples (seconds) with percentiles"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def summary(self) -> dict:
+        def ms(value: Optional[float]) -> Optional[int]:
+            return round(value * 1000) if value is not None else None
+
+        return {
+            "count": self.count,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+
+class CircuitBreakerOpen(Exception):
+    """Raised instead of calling a dependency that is known to be failing"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail immediately for `reset_timeout` seconds. It then lets up to
+    `half_open_max_calls` probe calls through: a successful probe closes it,
+    a failed one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def acquire(self) -> None:
+        """Reserve a call, or raise CircuitBreakerOpen"""
+        state = self.state
+        if state == self.OPEN:
+            self.rejected += 1
+            raise CircuitBreakerOpen(self.reset_timeout - (time.monotonic() - self._opened_at))
+        if state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitBreakerOpen(self.reset_timeout)
+            self._probes += 1
+
+    def release(self) -> None:
+        """Give back a reservation without an outcome (e.g. the call was cancelled)"""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def on_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probes = 0
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probes = 0
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], is_failure: Callable[[Exception], bool] = lambda e: True) -> Any:
+        self.acquire()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception as e:
+            if is_failure(e):
+                self.on_failure()
+            else:
+                self.on_success()
+            raise
+        self.on_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic.
+
+    Every request deposits `ratio` tokens (up to `max_tokens`) and every retry
+    withdraws one, so during an outage retries cannot multiply the load on the
+    dependency by more than roughly (1 + ratio).
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self.retries = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.retries += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self._tokens, 2),
+            "retries": self.retries,
+            "denied": self.denied,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
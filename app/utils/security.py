@@ -1,15 +1,27 @@
 
+import asyncio
+import time
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from app.config import settings
+from app.utils.admission import AdmissionController, AdmissionRejected
+from app.utils.metrics import LatencyWindow
+
+# bcrypt releases the GIL, so a few threads keep hashing off the event loop;
+# the admission controller bounds the queue in front of them
+_bcrypt_executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+bcrypt_admission = AdmissionController(limit=settings.BCRYPT_WORKERS, max_wait=settings.BCRYPT_QUEUE_TIMEOUT_SECONDS)
+bcrypt_durations = LatencyWindow()
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
     # Convert password to bytes
     password_bytes = password.encode('utf-8')
     # Generate salt and hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     # Return as string
     return hashed.decode('utf-8')
@@ -20,6 +32,44 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     hashed_bytes = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+async def _run_bcrypt(func, *args):
+    try:
+        async with bcrypt_admission.slot():
+            started = time.monotonic()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, func, *args)
+            finally:
+                bcrypt_durations.add(time.monotonic() - started)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now. Please try again in a moment.",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bcrypt threads (use this in request handlers)"""
+    return await _run_bcrypt(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt threads (use this in request handlers)"""
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
+def bcrypt_stats() -> dict:
+    return {
+        "rounds": settings.BCRYPT_ROUNDS,
+        "workers": settings.BCRYPT_WORKERS,
+        "queue": bcrypt_admission.stats(),
+        "duration": bcrypt_durations.summary(),
+    }
+
 def create_access_token(data: dict) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and get the same result or exception;
+    a dict result is handed to them as a copy marked "coalesced": True, so
+    work done once is only accounted once.
+    A caller being cancelled (e.g. its client disconnected) does not cancel
+    the shared work while anyone else is still waiting for it; the work is
+    only cancelled once every waiter has gone.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+        if not leader and isinstance(result, dict):
+            return {**result, "coalesced": True}
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
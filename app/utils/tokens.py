@@ -0,0 +1,21 @@
+import math
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional
+    _encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count for budgeting and accounting.
+
+    Uses tiktoken's cl100k_base encoding when it is installed, otherwise the
+    usual ~4 characters per token approximation.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
@@ -0,0 +1,30 @@
+"""Rolling session summary on system_messages
+
+Revision ID: 3b9c1e7a4f21
+Revises: ec26fa9f513c
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c1e7a4f21'
+down_revision: Union[str, None] = 'ec26fa9f513c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('system_messages', sa.Column('summarized_until', sa.DateTime(), nullable=True))
+    op.add_column('system_messages', sa.Column('turns_summarized', sa.Integer(), nullable=True))
+    op.add_column('system_messages', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('system_messages', 'updated_at')
+    op.drop_column('system_messages', 'turns_summarized')
+    op.drop_column('system_messages', 'summarized_until')
@@ -0,0 +1,26 @@
+"""Pin the RAG route on chat_sessions
+
+Revision ID: 5e0a9c3d7b12
+Revises: 8d4f2a6c1b90
+Create Date: 2026-10-18 15:31:07.218446
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a9c3d7b12'
+down_revision: Union[str, None] = '8d4f2a6c1b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('rag_route', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'rag_route')
@@ -0,0 +1,73 @@
+"""Hot-path indexes and unique usage_daily(user_id, date)
+
+Revision ID: a7c3e9f1d254
+Revises: 5e0a9c3d7b12
+Create Date: 2026-10-18 16:02:19.640318
+
+Indexes are built CONCURRENTLY (outside a transaction) so the upgrade does
+not block writes on a live database. If a concurrent build fails it leaves
+an INVALID index behind; drop it and run the upgrade again.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f1d254'
+down_revision: Union[str, None] = '5e0a9c3d7b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold duplicate usage rows (same user + day) into the oldest-id row first
+    op.execute("""
+        UPDATE usage_daily AS keep
+        SET sessions_created = agg.sessions_created,
+            qa_pairs_completed = agg.qa_pairs_completed,
+            tokens_used = agg.tokens_used,
+            files_uploaded = agg.files_uploaded,
+            updated_at = agg.updated_at
+        FROM (
+            SELECT MIN(id::text)::uuid AS keep_id,
+                   SUM(COALESCE(sessions_created, 0)) AS sessions_created,
+                   SUM(COALESCE(qa_pairs_completed, 0)) AS qa_pairs_completed,
+                   SUM(tokens_used) AS tokens_used,
+                   SUM(COALESCE(files_uploaded, 0)) AS files_uploaded,
+                   MAX(updated_at) AS updated_at
+            FROM usage_daily
+            GROUP BY user_id, date
+            HAVING COUNT(*) > 1
+        ) AS agg
+        WHERE keep.id = agg.keep_id
+    """)
+    op.execute("""
+        DELETE FROM usage_daily AS dup
+        USING usage_daily AS keep
+        WHERE dup.user_id = keep.user_id
+          AND dup.date = keep.date
+          AND dup.id::text > keep.id::text
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_chat_messages_session_id_created_at', 'chat_messages', ['session_id', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_chat_sessions_user_id_status_updated_at', 'chat_sessions', ['user_id', 'status', sa.text('updated_at DESC')], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_system_messages_session_id_created_at', 'system_messages', ['session_id', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_uploaded_files_user_id', 'uploaded_files', ['user_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_message_attachments_message_id', 'message_attachments', ['message_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('uq_usage_daily_user_id_date', 'usage_daily', ['user_id', 'date'], unique=True, postgresql_concurrently=True)
+        # Promote the unique index to a constraint (brief lock, no rebuild)
+        op.execute('ALTER TABLE usage_daily ADD CONSTRAINT uq_usage_daily_user_id_date UNIQUE USING INDEX uq_usage_daily_user_id_date')
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_usage_daily_user_id_date', 'usage_daily', type_='unique')
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_message_attachments_message_id', table_name='message_attachments', postgresql_concurrently=True)
+        op.drop_index('ix_uploaded_files_user_id', table_name='uploaded_files', postgresql_concurrently=True)
+        op.drop_index('ix_system_messages_session_id_created_at', table_name='system_messages', postgresql_concurrently=True)
+        op.drop_index('ix_chat_sessions_user_id_status_updated_at', table_name='chat_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_chat_messages_session_id_created_at', table_name='chat_messages', postgresql_concurrently=True)
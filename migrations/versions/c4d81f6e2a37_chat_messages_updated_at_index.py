@@ -0,0 +1,28 @@
+"""Index chat_messages(session_id, updated_at) for transcript delta sync
+
+Revision ID: c4d81f6e2a37
+Revises: a7c3e9f1d254
+Create Date: 2026-10-18 17:41:08.215904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d81f6e2a37'
+down_revision: Union[str, None] = 'a7c3e9f1d254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_chat_messages_session_id_updated_at', 'chat_messages', ['session_id', 'updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_chat_messages_session_id_updated_at', table_name='chat_messages', postgresql_concurrently=True)
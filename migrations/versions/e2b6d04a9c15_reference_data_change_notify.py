@@ -0,0 +1,44 @@
+"""NOTIFY reference_data_changed on subjects, grades and subscription_plans changes
+
+Revision ID: e2b6d04a9c15
+Revises: c4d81f6e2a37
+Create Date: 2026-10-18 18:20:44.903157
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6d04a9c15'
+down_revision: Union[str, None] = 'c4d81f6e2a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('subjects', 'grades', 'subscription_plans')
+
+
+def upgrade() -> None:
+    # API workers LISTEN on this channel and reload their reference data cache
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_reference_data_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('reference_data_changed', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_reference_data_changed
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_reference_data_changed()
+        """)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_reference_data_changed ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_reference_data_changed()")
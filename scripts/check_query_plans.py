@@ -0,0 +1,88 @@
+"""
+Check that the hot queries can use their indexes:
+python scripts/check_query_plans.py
+
+Runs EXPLAIN for each query with sequential scans disabled (so small dev
+tables don't hide a missing index) and exits non-zero if the expected index
+is not in the plan. Run it after changing these queries or the indexes.
+"""
+
+import json
+import sys
+import os
+import uuid
+from datetime import date, datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+
+HOT_QUERIES = [
+    (
+        "transcript / history: a session's messages in order",
+        "ix_chat_messages_session_id_created_at",
+        "SELECT * FROM chat_messages WHERE session_id = :id ORDER BY created_at DESC LIMIT 10",
+    ),
+    (
+        "transcript delta: a session's messages changed since a version",
+        "ix_chat_messages_session_id_updated_at",
+        "SELECT * FROM chat_messages WHERE session_id = :id AND updated_at > :since ORDER BY updated_at LIMIT 51",
+    ),
+    (
+        "session list: a user's active sessions, newest first",
+        "ix_chat_sessions_user_id_status_updated_at",
+        "SELECT * FROM chat_sessions WHERE user_id = :id AND status = 'ACTIVE' ORDER BY updated_at DESC LIMIT 20",
+    ),
+    (
+        "rolling summary of a session",
+        "ix_system_messages_session_id_created_at",
+        "SELECT * FROM system_messages WHERE session_id = :id ORDER BY created_at DESC LIMIT 1",
+    ),
+    (
+        "daily usage row",
+        "uq_usage_daily_user_id_date",
+        "SELECT * FROM usage_daily WHERE user_id = :id AND date = :day",
+    ),
+    (
+        "a user's uploaded files",
+        "ix_uploaded_files_user_id",
+        "SELECT * FROM uploaded_files WHERE user_id = :id",
+    ),
+    (
+        "attachments of a message",
+        "ix_message_attachments_message_id",
+        "SELECT * FROM message_attachments WHERE message_id = :id",
+    ),
+]
+
+
+def plan_indexes(node: dict) -> set:
+    names = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        names |= plan_indexes(child)
+    return names
+
+
+def main() -> int:
+    db = SessionLocal()
+    failures = 0
+    try:
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        params = {"id": uuid.uuid4(), "day": date.today(), "since": datetime.utcnow()}
+        for label, index, sql in HOT_QUERIES:
+            plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = plan_indexes(plan[0]["Plan"])
+            ok = index in used
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {label}: expected {index}, plan uses {sorted(used) or 'no index'}")
+    finally:
+        db.rollback()
+        db.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.models.chat_messages import ChatMessage
+from app.services.chat_service import ChatService
+
+
+class SlowWriteSession:
+    """AsyncSession stand-in: every flush (where the INSERT/UPDATEs run) takes flush_seconds"""
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self.added = []
+        self.flushes = 0
+        self.committed = False
+
+    async def get(self, model, ident, **kwargs):
+        return SimpleNamespace(id=ident, title="Forces", rag_route=None)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        self.flushes += 1
+        await asyncio.sleep(self.flush_seconds)
+
+    async def execute(self, statement):
+        pass
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_persist_ms_covers_the_flushed_writes():
+    db = SlowWriteSession(flush_seconds=0.05)
+    rag_result = {"answer": "Inertia is ...", "timings": {"queue_ms": 3, "upstream_ms": 120}}
+    tokens = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+    asyncio.run(ChatService._save_answer(db, uuid4(), "What is inertia?", SimpleNamespace(id=uuid4()), rag_result, tokens))
+
+    qa = next(obj for obj in db.added if isinstance(obj, ChatMessage))
+    timings = qa.message_metadata["timings"]
+    assert db.committed
+    # Both flushes (the INSERT for the attachment ids, then the counter updates) are inside it
+    assert db.flushes == 2
+    assert timings["persist_ms"] >= 100
+    assert timings["upstream_ms"] == 120
+    assert "persist_ms" not in rag_result["timings"]
@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+
+from app.utils.load_balancer import Upstream, UpstreamPool
+
+
+def make_pool(*names: str, **kwargs) -> UpstreamPool:
+    upstreams = [Upstream(f"http://{name}/ask", f"http://{name}/ask/stream", f"http://{name}/health") for name in names]
+    return UpstreamPool(upstreams, eject_after=1, eject_seconds=30, health_interval=0, health_timeout=1, **kwargs)
+
+
+def test_pick_prefers_unhealthy_over_ejected_upstreams():
+    pool = make_pool("a", "b")
+    a, b = pool.upstreams
+    a.healthy = False
+    b.healthy = False
+    pool.on_failure(b)
+    b.outstanding = -1  # would win on load alone
+
+    assert pool.pick() is a
+
+
+def test_health_probe_sends_auth_and_treats_404_as_no_endpoint():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("x-api-key"))
+        return httpx.Response(404 if request.url.host == "a" else 401)
+
+    async def probe():
+        pool = make_pool("a", "b", health_headers={"X-API-Key": "secret"})
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await pool.check_health(client)
+        return pool.upstreams
+
+    a, b = asyncio.run(probe())
+
+    assert seen == ["secret", "secret"]
+    assert a.healthy
+    assert not b.healthy
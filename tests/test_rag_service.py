@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.answer_cache import answer_cache
+from app.services.rag_service import RAGService
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stand-in for the router: counts calls, each one a new answer"""
+    calls = []
+
+    async def fetch_answer(self, payload, subject_id=None):
+        calls.append(payload["query"])
+        answer = f"answer {len(calls)}"
+        await asyncio.sleep(0.05)
+        return RAGService._build_result({"answer": answer})
+
+    monkeypatch.setattr(RAGService, "_fetch_answer", fetch_answer)
+    monkeypatch.setattr(RAGService, "inflight", SingleFlight())
+    answer_cache.invalidate()
+    yield calls
+    answer_cache.invalidate()
+
+
+def ask(fresh: bool = False):
+    return RAGService().get_answer(
+        "What is inertia?", chat_history=[], subject_id="physics", grade_id="9", fresh=fresh
+    )
+
+
+async def gather(*calls):
+    return await asyncio.gather(*calls)
+
+
+def test_concurrent_first_turn_questions_share_one_call(upstream):
+    first, second = asyncio.run(gather(ask(), ask()))
+
+    assert len(upstream) == 1
+    assert first["answer"] == second["answer"]
+
+
+def test_concurrent_regenerates_each_reach_the_router(upstream):
+    first, second = asyncio.run(gather(ask(fresh=True), ask(fresh=True)))
+
+    assert len(upstream) == 2
+    assert first["answer"] != second["answer"]
+    assert not first.get("coalesced") and not second.get("coalesced")
+
+
+def test_regenerate_skips_the_answer_cache(upstream):
+    cached = asyncio.run(ask())
+    regenerated = asyncio.run(ask(fresh=True))
+
+    assert len(upstream) == 2
+    assert regenerated["answer"] != cached["answer"]
+
+
+class SlowRouter:
+    """Stand-in HTTP client whose answers take `delay` seconds; honours the read timeout"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.timeouts = 0
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        await asyncio.sleep(min(self.delay, timeout.read))
+        if self.delay > timeout.read:
+            self.timeouts += 1
+            raise httpx.ReadTimeout("timed out")
+        return httpx.Response(200, json={"answer": "ok"}, request=httpx.Request("POST", url))
+
+
+def test_read_timeout_recovers_after_latency_shifts_up(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_TIMEOUT_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "RAG_TIMEOUT_MIN_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "RAG_TIMEOUT_MULTIPLIER", 2.0)
+    monkeypatch.setattr(RAGService, "latencies", {})
+    router = SlowRouter(delay=0.01)
+    monkeypatch.setattr(RAGService, "get_client", classmethod(lambda cls: router))
+    service = RAGService()
+
+    async def ask_until_answered(attempts: int) -> bool:
+        for _ in range(attempts):
+            try:
+                await service._fetch_answer({"query": "q"}, "physics")
+                return True
+            except HTTPException as e:
+                assert e.status_code == 504
+        return False
+
+    for _ in range(10):
+        assert asyncio.run(ask_until_answered(1))
+    assert RAGService._timeout_for("physics").read == 0.05
+
+    # The router slows down to three times the current deadline
+    router.delay = 0.15
+    assert asyncio.run(ask_until_answered(5))
+    assert 0 < router.timeouts < 5
+    assert RAGService._timeout_for("physics").read > 0.15